@@ -0,0 +1 @@
+"""Modules shared by the document and dataforecast chatbots."""
@@ -0,0 +1,67 @@
+import os
+import re
+import hashlib
+import threading
+
+# Streamlit serves <app dir>/static/ under this path (needs server.enableStaticServing).
+# It is relative so it keeps working behind a baseUrlPath.
+STATIC_URL_PREFIX = "app/static/"
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+_stylesheets = {}
+_stylesheets_lock = threading.Lock()
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def static_url(app_dir, file_name):
+    """
+    URL of a file in `app_dir`/static, versioned by its content hash.
+
+    The hash is computed once per process, so reruns only pay for string
+    formatting and browsers can keep the file cached until it changes.
+    """
+    path = os.path.join(app_dir, "static", file_name)
+    with _versions_lock:
+        if path not in _versions:
+            with open(path, "rb") as f:
+                _versions[path] = hashlib.sha256(f.read()).hexdigest()[:12]
+        version = _versions[path]
+    return f"{STATIC_URL_PREFIX}{file_name}?v={version}"
+
+
+def _inline_css(app_dir, file_name):
+    """
+    A static stylesheet's text, with relative url()s pointed at static_url.
+
+    Streamlit sends static .css files as text/plain with nosniff, so browsers
+    refuse to load them; stylesheets are inlined instead.
+    """
+    path = os.path.join(app_dir, "static", file_name)
+    with open(path, encoding="utf-8") as f:
+        css = f.read()
+
+    def absolute(match):
+        target = match.group(2)
+        if re.match(r"^([a-z][a-z0-9+.-]*:|/|#)", target, re.IGNORECASE):
+            return match.group(0)
+        return f'url("{static_url(app_dir, target)}")'
+
+    return _CSS_URL.sub(absolute, css)
+
+
+def stylesheet_tag(app_dir, *file_names):
+    """
+    A <style> block with the given static stylesheets inlined.
+
+    Each file is read once per process; reruns reuse the cached text.
+    """
+    parts = []
+    for file_name in file_names:
+        path = os.path.join(app_dir, "static", file_name)
+        with _stylesheets_lock:
+            if path not in _stylesheets:
+                _stylesheets[path] = _inline_css(app_dir, file_name)
+            parts.append(_stylesheets[path])
+    return "<style>" + "\n".join(parts) + "</style>"
@@ -0,0 +1,85 @@
+import os
+import json
+import logging
+import threading
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bedrock connection settings (override through the environment)
+BEDROCK_REGION = os.getenv("BEDROCK_REGION", "ap-south-1")
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "32"))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "5"))
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "120"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "4"))
+BEDROCK_RETRY_MODE = os.getenv("BEDROCK_RETRY_MODE", "adaptive")   # "standard" or "adaptive"
+
+
+class BedrockGateway:
+    """
+    One bedrock-runtime client per process, shared by every session and thread.
+
+    The client is created on first use with a connection pool large enough
+    for concurrent sessions, bounded connect/read timeouts and botocore
+    retries with backoff, so Streamlit reruns never rebuild it and a slow or
+    throttled request cannot hang a session forever.
+    """
+
+    def __init__(self, region=BEDROCK_REGION, max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                 connect_timeout=BEDROCK_CONNECT_TIMEOUT, read_timeout=BEDROCK_READ_TIMEOUT,
+                 max_attempts=BEDROCK_MAX_ATTEMPTS, retry_mode=BEDROCK_RETRY_MODE):
+        self.region = region
+        self.config = Config(
+            region_name=region,
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={"max_attempts": max_attempts, "mode": retry_mode},
+        )
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """Return the underlying boto3 client, creating it on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    logger.info(f"Creating Bedrock client for {self.region}")
+                    self._client = boto3.client("bedrock-runtime", config=self.config)
+        return self._client
+
+    def invoke(self, model_id, body):
+        """Send a JSON request body to `model_id` and return the decoded JSON response."""
+        response = self.client().invoke_model(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body),
+        )
+        return json.loads(response["body"].read())
+
+    def stream(self, model_id, body):
+        """Send a JSON request body to `model_id` and yield each decoded response chunk as it arrives."""
+        response = self.client().invoke_model_with_response_stream(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps(body),
+        )
+        for event in response["body"]:
+            chunk = event.get("chunk")
+            if chunk:
+                yield json.loads(chunk["bytes"])
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_bedrock_gateway():
+    """Process-wide Bedrock gateway. The client itself is only created on the first request."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = BedrockGateway()
+        return _gateway
@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import psycopg2
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Postgres connection settings (override through the environment)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))                        # Connections kept open
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))        # Extra connections allowed under load
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))               # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))               # Reopen connections older than this
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_SLOW_WAIT_SECONDS = 1.0                                                # Log checkouts that queued longer than this
+
+
+class PoolMetrics:
+    """Counters for one pool: checkouts, how many had to wait, overflow use and failures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "overflow_checkouts": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "invalidations": 0,
+        }
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def record_checkout(self, waited_seconds, overflow):
+        with self._lock:
+            self.counters["checkouts"] += 1
+            if overflow:
+                self.counters["overflow_checkouts"] += 1
+            if waited_seconds is not None:
+                self.counters["waits"] += 1
+                self.wait_seconds += waited_seconds
+                self.max_wait_seconds = max(self.max_wait_seconds, waited_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["wait_seconds"] = round(self.wait_seconds, 3)
+            stats["max_wait_seconds"] = round(self.max_wait_seconds, 3)
+        return stats
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records checkout waits and overflow use in `metrics`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        # No idle connection and no room to open another: this checkout has to queue
+        must_wait = self.checkedin() == 0 and 0 <= self._max_overflow <= self.overflow()
+        started = time.monotonic()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.count("timeouts")
+            logger.error("Timed out after %.1fs waiting for a database connection: %s", time.monotonic() - started, self.status())
+            raise
+        waited = time.monotonic() - started if must_wait else None
+        if waited is not None and waited > DB_SLOW_WAIT_SECONDS:
+            logger.warning("Waited %.1fs for a database connection: %s", waited, self.status())
+        # Past pool_size checked out, this checkout is being served by an overflow connection
+        self.metrics.record_checkout(waited, self.checkedout() > self.size())
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class DatabasePool:
+    """
+    One bounded Postgres connection pool per process, shared by every module.
+
+    Connections are opened lazily up to `pool_size`, plus `max_overflow`
+    under load; beyond that callers queue for up to `timeout` seconds.
+    Each connection is pinged before it is handed out, recycled after
+    `recycle` seconds and opened with a server-side statement timeout, so
+    a dead socket or a runaway query never hangs a session.
+
+    Raw psycopg2 callers use `connect()` / `connection()`; SQLAlchemy code
+    uses `engine`, which draws from the same pool.
+    """
+
+    def __init__(self, dbname=None, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, connect_timeout=DB_CONNECT_TIMEOUT,
+                 statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS):
+        self.connect_args = {
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": os.getenv("DB_PORT", "5432"),
+            "user": os.getenv("DB_USER", "postgres"),
+            "password": os.getenv("DB_PASSWORD", "postgres"),
+            "dbname": dbname or os.getenv("DB_NAME", "postgres"),
+            "connect_timeout": connect_timeout,
+            "options": f"-c statement_timeout={statement_timeout_ms}",
+        }
+        pool = MeteredQueuePool(
+            self._open,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            timeout=timeout,
+            recycle=recycle,
+            pre_ping=True,
+        )
+        self.metrics = pool.metrics
+        event.listen(pool, "connect", lambda dbapi_connection, record: self.metrics.count("connects"))
+        event.listen(pool, "invalidate", lambda dbapi_connection, record, exception: self.metrics.count("invalidations"))
+        # The engine only adds the psycopg2 dialect; its connections come from the same pool
+        self.engine = create_engine("postgresql+psycopg2://", pool=pool)
+        logger.info(
+            "Database pool for %s@%s:%s/%s (size %d, overflow %d)",
+            self.connect_args["user"], self.connect_args["host"], self.connect_args["port"],
+            self.connect_args["dbname"], pool_size, max_overflow,
+        )
+
+    def _open(self):
+        return psycopg2.connect(**self.connect_args)
+
+    def connect(self):
+        """
+        Check out a pooled connection.
+
+        It behaves like a psycopg2 connection; `close()` returns it to the
+        pool (rolling back anything uncommitted) instead of closing it.
+        """
+        return self.engine.pool.connect()
+
+    @contextmanager
+    def connection(self):
+        """Pooled connection that commits on success, rolls back on error and is always returned."""
+        conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.error("Rollback failed: %s", e)
+            raise
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Pool metrics plus the current pool occupancy."""
+        pool = self.engine.pool
+        stats = self.metrics.snapshot()
+        stats.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+        return stats
+
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+
+def get_db_pool(dbname=None):
+    """
+    Process-wide database pool for `dbname` (DB_NAME by default).
+
+    Callers naming the same database share one pool. Connections are only
+    opened on first checkout.
+    """
+    dbname = dbname or os.getenv("DB_NAME", "postgres")
+    with _db_pool_lock:
+        if dbname not in _db_pools:
+            _db_pools[dbname] = DatabasePool(dbname)
+        return _db_pools[dbname]
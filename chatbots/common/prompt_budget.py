@@ -0,0 +1,146 @@
+import re
+import math
+
+# Context window (tokens) and average characters per token for the models the chatbots call
+MODEL_LIMITS = {
+    "amazon.titan-text-express-v1": {"context_tokens": 8192, "chars_per_token": 4.0},
+    "amazon.titan-text-lite-v1": {"context_tokens": 4096, "chars_per_token": 4.0},
+    "amazon.titan-text-premier-v1:0": {"context_tokens": 32000, "chars_per_token": 4.0},
+}
+DEFAULT_MODEL_LIMITS = {"context_tokens": 4096, "chars_per_token": 4.0}
+SAFETY_MARGIN = 0.05       # Share of the window held back because token counts are estimates
+TRUNCATION_MARK = " …"
+
+PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+PLACEHOLDER_RE = re.compile(r"\{(context|question)\}")
+
+
+def model_limits(model_id):
+    return MODEL_LIMITS.get(model_id, DEFAULT_MODEL_LIMITS)
+
+
+def estimate_tokens(text, chars_per_token=4.0):
+    """
+    Fast upper-leaning token estimate without loading a tokenizer.
+
+    Every word or punctuation mark costs at least one token and long words
+    are charged one token per `chars_per_token` characters, which tracks
+    subword tokenizers closely on prose and errs high on numbers and tables.
+    """
+    tokens = 0
+    for piece in PIECE_RE.findall(text):
+        length = len(piece)
+        tokens += 1 if length <= chars_per_token else math.ceil(length / chars_per_token)
+    return tokens
+
+
+class PromptSection:
+    """
+    A piece of context competing for the prompt budget.
+
+    Lower `priority` values are packed first. `order` decides where the
+    section appears in the final prompt, so sections can be chosen by
+    relevance but read in document order. Sections that do not fit whole
+    are cut short when `truncatable`, otherwise dropped.
+    """
+
+    def __init__(self, text, priority=0, order=None, name=None, truncatable=True):
+        self.text = text
+        self.priority = priority
+        self.order = order
+        self.name = name
+        self.truncatable = truncatable
+
+
+class BudgetedPrompt:
+    """The assembled prompt plus what the budgeter had to leave out."""
+
+    def __init__(self, text, estimated_tokens, dropped, truncated):
+        self.text = text
+        self.estimated_tokens = estimated_tokens
+        self.dropped = dropped          # Names of sections left out entirely
+        self.truncated = truncated      # Names of sections that were cut short
+
+
+class PromptBudgeter:
+    """
+    Assembles prompts that fit a model's context window.
+
+    The window minus the completion allowance (`max_output_tokens`) and a
+    safety margin is split between the fixed instruction text, the question
+    (capped at `question_share` of the window) and the context. Only the
+    context is trimmed: sections are packed by priority until the budget is
+    spent.
+    """
+
+    def __init__(self, model_id, max_output_tokens=500, question_share=0.25):
+        limits = model_limits(model_id)
+        self.model_id = model_id
+        self.chars_per_token = limits["chars_per_token"]
+        self.context_tokens = limits["context_tokens"]
+        self.max_output_tokens = max_output_tokens
+        self.question_share = question_share
+
+    @property
+    def prompt_tokens(self):
+        """Tokens available for the whole prompt."""
+        return int(self.context_tokens * (1 - SAFETY_MARGIN)) - self.max_output_tokens
+
+    def count(self, text):
+        return estimate_tokens(text, self.chars_per_token)
+
+    def truncate(self, text, max_tokens):
+        """Cut `text` on a whitespace boundary so it fits in `max_tokens`."""
+        if self.count(text) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        limit = int(max_tokens * self.chars_per_token)
+        while limit > 0:
+            cut = text.rfind(" ", 0, limit)
+            candidate = text[:cut if cut > limit // 2 else limit].rstrip() + TRUNCATION_MARK
+            if self.count(candidate) <= max_tokens:
+                return candidate
+            limit = int(limit * 0.9)
+        return ""
+
+    def context_budget(self, template, question):
+        """Tokens left for context once the template and question are placed."""
+        instruction_tokens = self.count(PLACEHOLDER_RE.sub("", template))
+        question_tokens = min(self.count(question), int(self.prompt_tokens * self.question_share))
+        return self.prompt_tokens - instruction_tokens - question_tokens
+
+    def build(self, template, question, sections, separator="\n\n"):
+        """
+        Fill `template`'s {context} and {question} placeholders within budget.
+
+        Returns a BudgetedPrompt. The question is only shortened if it alone
+        exceeds its share of the window; the instruction text is never cut.
+        """
+        question = self.truncate(question, int(self.prompt_tokens * self.question_share))
+        remaining = self.context_budget(template, question)
+        separator_tokens = self.count(separator)
+
+        chosen, dropped, truncated = [], [], []
+        ranked = sorted(enumerate(sections), key=lambda item: (item[1].priority, item[0]))
+        for index, section in ranked:
+            cost = self.count(section.text) + (separator_tokens if chosen else 0)
+            if cost <= remaining:
+                chosen.append((index, section, section.text))
+                remaining -= cost
+            elif section.truncatable and remaining > separator_tokens + 8:
+                text = self.truncate(section.text, remaining - (separator_tokens if chosen else 0))
+                if text:
+                    chosen.append((index, section, text))
+                    truncated.append(section.name)
+                    remaining -= self.count(text) + (separator_tokens if len(chosen) > 1 else 0)
+                else:
+                    dropped.append(section.name)
+            else:
+                dropped.append(section.name)
+
+        chosen.sort(key=lambda item: (item[1].order is None, item[1].order if item[1].order is not None else 0, item[0]))
+        context = separator.join(text for _, _, text in chosen)
+        values = {"context": context, "question": question}
+        prompt = PLACEHOLDER_RE.sub(lambda match: values[match.group(1)], template)
+        return BudgetedPrompt(prompt, self.count(prompt), dropped, truncated)
@@ -2,6 +2,11 @@ import os
 import streamlit as st
 import json
 import pandas as pd
+import sys
+
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from auth import DATA_DIR, load_users, save_users, require_auth, is_authenticated
 
 # Admin Panel Password
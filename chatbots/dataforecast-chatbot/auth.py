@@ -8,7 +8,7 @@ from streamlit_javascript import st_javascript
 from db_storage import save_user_data
 import time
 from datetime import datetime, timedelta
-import psycopg2
+from common.db_pool import get_db_pool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -291,34 +291,28 @@ def check_premium_status_in_db(email=None, name=None):
             return False
             
         # Check for premium status in database
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            dbname=os.getenv("DB_NAME")
-        )
-        cursor = conn.cursor()
+        with get_db_pool().connection() as conn:
+            cursor = conn.cursor()
         
-        # Check the premium users table
-        search_query = """
-            SELECT * FROM bbt_premiumusers 
-            WHERE 1=1
-        """
+            # Check the premium users table
+            search_query = """
+                SELECT * FROM bbt_premiumusers 
+                WHERE 1=1
+            """
         
-        params = []
+            params = []
         
-        # Add conditions based on available identifiers
-        if email:
-            search_query += " AND email = %s"
-            params.append(email)
+            # Add conditions based on available identifiers
+            if email:
+                search_query += " AND email = %s"
+                params.append(email)
         
-        if name:
-            search_query += " AND name = %s"
-            params.append(name)
+            if name:
+                search_query += " AND name = %s"
+                params.append(name)
             
-        cursor.execute(search_query, params)
-        result = cursor.fetchone()
-        conn.close()
+            cursor.execute(search_query, params)
+            result = cursor.fetchone()
         
         # If we find a record, user has premium access
         if result:
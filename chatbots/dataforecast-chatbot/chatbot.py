@@ -1,10 +1,11 @@
 import os
-import json
 import pandas as pd
 import streamlit as st
 import logging
 import time
 from auth import increment_usage, DATA_DIR
+from common.prompt_budget import PromptBudgeter, PromptSection
+from upload_ingest import MAX_UPLOAD_MB
 from db_storage import load_chat_history, save_chat_history, delete_chat_history
 
 # Set up logging
@@ -53,30 +54,39 @@ def clear_user_chat_history(username):
     st.success("✅ Chat history cleared!")
     st.rerun()
 
+CHAT_MODEL_ID = "amazon.titan-text-lite-v1"
+CHAT_MAX_OUTPUT_TOKENS = 500
+
+# Keeps the question and instructions intact and trims only the dataset context to the model's window
+prompt_budgeter = PromptBudgeter(CHAT_MODEL_ID, max_output_tokens=CHAT_MAX_OUTPUT_TOKENS)
+
 # 📤 Process User Input and Get Response
-def query_bedrock_stream(user_input, df, bedrock_client):
-    # Get sample data as text
-    df_sample = df.head(5).to_string()
-    df_summary = df.describe().to_string()
-    
+def query_bedrock_stream(user_input, dataset, bedrock_gateway):
+    # Only load the columns the question mentions; fall back to the whole dataset when it names none
+    referenced = dataset.referenced_columns(user_input)
+    df = dataset.frame(referenced or None)
+    sample = df.head(5) if referenced else dataset.head(5)
+
+    # Dataset context, most important first: the budgeter drops or trims from the end of this list
+    dataset_info = f"""Dataset Information:
+    - Filename: {dataset.name}
+    - Format: {dataset.format}
+    - Number of Rows: {dataset.num_rows}
+    - Number of Columns: {len(dataset.columns)}"""
+    sections = [
+        PromptSection(dataset_info, priority=0, order=0, name="info", truncatable=False),
+        PromptSection(f"- Columns: {', '.join(map(str, dataset.columns))}", priority=1, order=1, name="columns"),
+        PromptSection(f"Sample Data (first 5 rows):\n{sample.to_string()}", priority=2, order=2, name="sample"),
+        PromptSection(f"Statistical Summary:\n{df.describe().to_string()}", priority=3, order=3, name="summary"),
+    ]
+
     # Enhanced prompt focused on file uploads and data analysis with improved response quality
-    prompt = f"""
+    template = f"""
     You are a professional data analyst assistant specialized in file uploads and data processing. You provide insightful, accurate, and business-focused responses about datasets.
 
-    Dataset Information:
-    - Filename: {getattr(df, '_filename', 'Uploaded dataset')}
-    - Format: {getattr(df, '_format', 'CSV/Excel/Other')}
-    - Number of Rows: {len(df)}
-    - Number of Columns: {len(df.columns)}
-    - Columns: {', '.join(df.columns)}
-    
-    Sample Data (first 5 rows):
-    {df_sample}
-    
-    Statistical Summary:
-    {df_summary}
+    {{context}}
     
-    User's Question: {user_input}
+    User's Question: {{question}}
     
     Provide a concise, professional response that:
     1. Directly answers the question with precision and clarity
@@ -86,22 +96,25 @@ def query_bedrock_stream(user_input, df, bedrock_client):
     5. Maintains a helpful, business-oriented tone throughout
     
     For file upload questions:
-    - Be specific about supported formats (CSV, XLS, XLSX, JSON, PARQUET, PDF)
-    - Mention the 5MB file size limit when relevant
+    - Be specific about supported formats (CSV, XLS, XLSX, JSON, NDJSON, PARQUET, PDF)
+    - Mention the {MAX_UPLOAD_MB}MB file size limit when relevant
     - Explain data validation processes
     - Suggest best practices for data preparation
 
     Structure your response with clear paragraphs, bullet points for lists, and emphasize key insights.
     """
+    prompt = prompt_budgeter.build(template, user_input, sections, separator="\n    \n    ")
+    if prompt.dropped or prompt.truncated:
+        logger.info(f"Prompt budget trimmed dataset context (dropped: {prompt.dropped}, truncated: {prompt.truncated})")
 
     payload = {
-        "modelId": "amazon.titan-text-lite-v1",
+        "modelId": CHAT_MODEL_ID,
         "contentType": "application/json",
         "accept": "application/json",
         "body": {
-            "inputText": prompt[:4000],
+            "inputText": prompt.text,
             "textGenerationConfig": {
-                "maxTokenCount": 500,
+                "maxTokenCount": CHAT_MAX_OUTPUT_TOKENS,
                 "stopSequences": [],
                 "temperature": 0.7,
                 "topP": 0.9
@@ -110,14 +123,7 @@ def query_bedrock_stream(user_input, df, bedrock_client):
     }
 
     try:
-        response = bedrock_client.invoke_model(
-            body=json.dumps(payload["body"]),
-            modelId=payload["modelId"],
-            accept=payload["accept"],
-            contentType=payload["contentType"]
-        )
-
-        result = json.loads(response["body"].read())
+        result = bedrock_gateway.invoke(payload["modelId"], payload["body"])
         full_response = result["results"][0]["outputText"]
         return full_response.strip()
 
@@ -125,7 +131,7 @@ def query_bedrock_stream(user_input, df, bedrock_client):
         return f"❌ Error: {str(e)}"
 
 # 🧠 Chatbot Section
-def chatbot_section(dataframes, file_names, bedrock_client):
+def chatbot_section(datasets, file_names, bedrock_gateway):
     # Check if user is authenticated before proceeding
     if not st.session_state.get("authenticated", False):
         logger.info("User not authenticated - chatbot unavailable")
@@ -175,7 +181,7 @@ def chatbot_section(dataframes, file_names, bedrock_client):
 
     # Process when submitted
     if user_input:
-        if not dataframes:
+        if not datasets:
             st.error("Please upload at least one dataset first.")
             return
         
@@ -192,21 +198,18 @@ def chatbot_section(dataframes, file_names, bedrock_client):
             st.markdown(user_input)
         
         # Get selected dataset
-        if len(dataframes) > 1:
-            selected_df_index = st.selectbox("Select Dataset to Query", file_names, key="dataset_select")
-            selected_df = dataframes[file_names.index(selected_df_index)]
+        if len(datasets) > 1:
+            selected_dataset_name = st.selectbox("Select Dataset to Query", file_names, key="dataset_select")
+            selected_dataset = datasets[file_names.index(selected_dataset_name)]
         else:
-            selected_df = dataframes[0]
-            # Add filename attribute to dataframe
-            selected_df._filename = file_names[0]
-            selected_df._format = file_names[0].split('.')[-1].upper()
+            selected_dataset = datasets[0]
         
         # Generate assistant response with streaming effect
         with st.chat_message("assistant"):
             response_placeholder = st.empty()
             
             # For real streaming effect, build up the response gradually
-            full_response = query_bedrock_stream(user_input, selected_df, bedrock_client)
+            full_response = query_bedrock_stream(user_input, selected_dataset, bedrock_gateway)
             
             # Display response with a typing effect
             response_text = ""
@@ -0,0 +1,226 @@
+import os
+import re
+import uuid
+import hashlib
+import logging
+import threading
+from auth import DATA_DIR
+from frame_cache import get_frame_cache
+
+# pyarrow gives us memory-mapped, column-projected reads; without it uploads stay in the in-memory frame cache only
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# On-disk column cache settings (override through the environment; point the directory at a shared volume
+# so restarts and new replicas reuse it)
+COLUMN_CACHE_DIR = os.getenv("COLUMN_CACHE_DIR", os.path.join(DATA_DIR, "column_cache"))
+COLUMN_CACHE_MAX_MB = float(os.getenv("COLUMN_CACHE_MAX_MB", "4096"))
+COLUMN_CACHE_BATCH_ROWS = 65536      # Rows per record batch, so previews only touch the first one
+
+
+class ColumnStore:
+    """
+    Parsed uploads saved as uncompressed Arrow IPC files, one per content hash.
+
+    Files are memory-mapped on read and only the requested columns are
+    converted to pandas, so wide files cost memory only for the columns a
+    caller actually uses. The directory survives restarts; once it grows
+    past `max_bytes` the least recently read files are deleted.
+    """
+
+    def __init__(self, directory=COLUMN_CACHE_DIR, max_bytes=int(COLUMN_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = pa is not None
+        self._lock = threading.Lock()
+        self._writing = {}    # name -> lock held while that file is parsed and written
+        self._unwritable = set()    # Names whose frames have no Arrow representation; never retried
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.arrow")
+
+    def has(self, name):
+        return self.enabled and os.path.exists(self.path(name))
+
+    def ensure(self, name, loader):
+        """
+        Make sure `name` is on disk, calling `loader()` to parse it if not.
+
+        Returns the parsed frame when this call parsed it, otherwise None.
+        Concurrent calls for one name wait for the first instead of parsing again,
+        and a name whose frame could not be stored as Arrow is not parsed again.
+        """
+        if not self.enabled or name in self._unwritable or self.has(name):
+            return None
+        with self._lock:
+            name_lock = self._writing.setdefault(name, threading.Lock())
+        with name_lock:
+            try:
+                if self.has(name):
+                    return None
+                frame = loader()
+                self.write(name, frame)
+                return frame
+            finally:
+                with self._lock:
+                    self._writing.pop(name, None)
+
+    def write(self, name, frame):
+        """Save `frame`; returns False when it cannot be represented in Arrow (e.g. mixed-type columns)."""
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError) as e:
+            logger.info(f"Not caching {name} on disk, it has no Arrow representation: {e}")
+            self._unwritable.add(name)
+            return False
+        path = self.path(name)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=COLUMN_CACHE_BATCH_ROWS)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Could not write column cache file {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        self.prune()
+        return True
+
+    def _open(self, name):
+        path = self.path(name)
+        os.utime(path)    # Reads count as use for pruning
+        return pa.ipc.open_file(pa.memory_map(path, "r"))
+
+    def describe(self, name):
+        """(column names, row count) from the file, without converting any data."""
+        table = self._open(name).read_all()    # Zero-copy over the memory map
+        return table.schema.names, table.num_rows
+
+    def read(self, name, columns=None, rows=None):
+        """DataFrame with only `columns` (all when None), optionally only the first `rows` rows."""
+        reader = self._open(name)
+        if rows is None:
+            table = reader.read_all()
+        else:
+            batches, count = [], 0
+            for index in range(reader.num_record_batches):
+                if count >= rows:
+                    break
+                batch = reader.get_batch(index)
+                batches.append(batch)
+                count += batch.num_rows
+            table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, rows)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas()
+
+    def prune(self):
+        """Delete the least recently read files until the directory fits `max_bytes`."""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".arrow")]
+        except OSError:
+            return
+        files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class UploadedDataset:
+    """
+    Lazy handle to one parsed upload.
+
+    Column names and the row count come from the on-disk Arrow file; data
+    is only read when asked for, and only the columns asked for. Results go
+    through the process-wide frame cache, so repeated reads on reruns are
+    served from memory. When the frame cannot be stored as Arrow, the
+    handle falls back to the full frame held in the frame cache.
+    """
+
+    def __init__(self, name, digest, options, loader, store=None):
+        self.name = name
+        self.format = name.split(".")[-1].upper()
+        self.digest = digest
+        self.options = options
+        self.store = store or get_column_store()
+        self.key = f"{digest}-{hashlib.sha256(repr(sorted(options.items())).encode()).hexdigest()[:12]}"
+        self._loader = loader
+
+        # A full frame already in memory (e.g. one Arrow cannot store) is reused instead of parsing again
+        cache = get_frame_cache()
+        full_key = cache.make_key(digest, dict(options, columns=None))
+        parsed = None
+        if not self.store.has(self.key) and cache.shape(full_key) is None:
+            parsed = self.store.ensure(self.key, loader)
+
+        if self.store.has(self.key):
+            self.on_disk = True
+            self.columns, self.num_rows = self.store.describe(self.key)
+        else:
+            self.on_disk = False
+            if parsed is not None:
+                cache.put(full_key, parsed)
+                self.columns, self.num_rows = list(parsed.columns), len(parsed)
+            else:
+                shape = cache.shape(full_key)
+                if shape is None:
+                    frame = self.frame()
+                    shape = list(frame.columns), len(frame)
+                self.columns, self.num_rows = shape
+
+    def frame(self, columns=None):
+        """DataFrame of the upload, limited to `columns` when given. Callers own the returned copy."""
+        if columns is not None:
+            wanted = set(columns)
+            columns = [column for column in self.columns if column in wanted]
+        options = dict(self.options, columns=columns)
+        return get_frame_cache().get_or_load(self.digest, options, lambda: self._read(columns))
+
+    def head(self, rows):
+        """First `rows` rows, read from the first record batch only."""
+        if self.on_disk:
+            return self.store.read(self.key, rows=rows)
+        return self.frame().head(rows)
+
+    def referenced_columns(self, text):
+        """Columns whose names appear in `text` (as whole words, case-insensitive)."""
+        lowered = text.lower()
+        return [
+            column for column in self.columns
+            if re.search(rf"(?<!\w){re.escape(str(column).lower())}(?!\w)", lowered)
+        ]
+
+    def _read(self, columns):
+        if self.on_disk:
+            return self.store.read(self.key, columns=columns)
+        if columns is None:
+            return self._loader()
+        return self.frame()[columns]
+
+
+_column_store = None
+_column_store_lock = threading.Lock()
+
+def get_column_store():
+    """Process-wide column store."""
+    global _column_store
+    with _column_store_lock:
+        if _column_store is None:
+            _column_store = ColumnStore()
+        return _column_store
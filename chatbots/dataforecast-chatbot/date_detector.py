@@ -0,0 +1,222 @@
+import re
+import logging
+import warnings
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+import pandas as pd
+from frame_cache import get_frame_cache
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATE_SAMPLE_ROWS = 2000            # Rows scored per column
+DATE_FORMAT_PROBES = 20            # Values used to guess a text column's date format
+MIN_PARSED_SHARE = 0.8             # Share of sampled values a text column must parse to count as dates
+MIN_YEAR, MAX_YEAR = 1800, 2200    # Parsed dates outside this range mean the guess is wrong
+SYNTHETIC_START = "2000-01-01"
+SYNTHETIC_DATE_COLUMN = "synthetic_date"
+SYNTHETIC_FALLBACK_ROWS = 1000     # Rows kept when a daily range from SYNTHETIC_START would overflow
+
+DATE_NAME_KEYWORDS = {"year", "date", "age", "month", "time", "period", "quarter", "yr", "day", "timestamp"}
+NUMERIC_TIME_KEYWORDS = {"year", "age", "period", "yr"}
+
+_detections = OrderedDict()        # Dataset key -> DateColumn
+_detections_lock = threading.Lock()
+DETECTIONS_MEMO_SIZE = 512
+
+
+class DateColumn:
+    """
+    The column a dataset's forecast runs on, and how to turn it into dates.
+
+    `kind` is one of:
+    - "datetime": already datetime
+    - "text": strings in `date_format` (None when values mix formats)
+    - "year": whole-number years
+    - "sequence": ordered numbers, mapped to consecutive days
+    - "synthetic": no usable column; `column` is a new daily range
+    """
+
+    def __init__(self, column, kind, date_format=None, score=0.0):
+        self.column = column
+        self.kind = kind
+        self.date_format = date_format
+        self.score = score
+
+    def __repr__(self):
+        return f"DateColumn({self.column!r}, {self.kind!r}, format={self.date_format!r}, score={self.score:.2f})"
+
+
+def _name_tokens(name):
+    """Lower-case words in a column name, splitting camelCase and punctuation ("OrderDate" -> order, date)."""
+    return {token.lower() for token in re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+", str(name))}
+
+
+def _is_monotonic(values):
+    return len(values) > 1 and (values.is_monotonic_increasing or values.is_monotonic_decreasing)
+
+
+def _in_year_range(dates):
+    years = dates.dt.year
+    return bool(((years >= MIN_YEAR) & (years <= MAX_YEAR)).all())
+
+
+def _guess_formats(values):
+    """strftime formats guessed from a few sampled values, most common first (both day/month orders)."""
+    guesses = Counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")    # pandas warns about ambiguous day/month order; both orders are tried
+        for value in values.head(DATE_FORMAT_PROBES):
+            for dayfirst in (False, True):
+                try:
+                    guessed = guess_datetime_format(str(value), dayfirst=dayfirst)
+                except (TypeError, ValueError):
+                    guessed = None
+                if guessed:
+                    guesses[guessed] += 1
+    return [date_format for date_format, _ in guesses.most_common()]
+
+
+def _parse_text_dates(values, date_format):
+    if date_format is not None:
+        return pd.to_datetime(values, format=date_format, errors="coerce")
+    return pd.to_datetime(values, format="mixed", errors="coerce")
+
+
+def _year_dates(values):
+    return pd.to_datetime(values.round().astype("Int64").astype(str), format="%Y", errors="coerce")
+
+
+def _score_column(name, values):
+    """DateColumn candidate for one sampled column, or None when it cannot hold dates."""
+    values = values.dropna()
+    if values.empty:
+        return None
+    tokens = _name_tokens(name)
+    name_bonus = 0.3 if tokens & DATE_NAME_KEYWORDS else 0.0
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if not _in_year_range(values):
+            return None
+        return DateColumn(name, "datetime", score=1.0 + name_bonus + 0.2 * _is_monotonic(values))
+
+    if pd.api.types.is_bool_dtype(values):
+        return None
+
+    if pd.api.types.is_numeric_dtype(values):
+        integral = bool((values == np.floor(values)).all())
+        monotonic = _is_monotonic(values)
+        named_time = bool(tokens & NUMERIC_TIME_KEYWORDS)
+        # Years: whole numbers in a plausible range, named like a time column or in the modern era
+        low, high = (1000, 3000) if named_time else (1900, 2100)
+        if integral and values.min() >= low and values.max() <= high:
+            return DateColumn(name, "year", score=0.7 + name_bonus + 0.2 * monotonic)
+        # Ordered or time-named numbers (ages, periods) become consecutive days
+        if named_time or (integral and values.is_monotonic_increasing and values.is_unique):
+            return DateColumn(name, "sequence", score=0.3 + name_bonus)
+        return None
+
+    # Text: must parse with one regular format (or, weaker, a mix) into plausible years
+    values = values.astype(str)
+    formats = _guess_formats(values)
+    if not formats and not name_bonus:
+        return None
+    date_format, parsed, share = None, None, 0.0
+    for candidate in formats or [None]:
+        candidate_parsed = _parse_text_dates(values, candidate)
+        candidate_share = candidate_parsed.notna().mean()
+        if candidate_share > share:
+            date_format, parsed, share = candidate, candidate_parsed, candidate_share
+    if share < MIN_PARSED_SHARE or not _in_year_range(parsed.dropna()):
+        return None
+    regularity = 1.0 if date_format is not None else 0.8
+    return DateColumn(name, "text", date_format, score=share * regularity + name_bonus + 0.2 * _is_monotonic(parsed.dropna()))
+
+
+# Function to pick a dataset's date column from a sample of its rows
+def detect_date_column(dataset, sample=None):
+    """
+    Best date column of `dataset`, scored on its first DATE_SAMPLE_ROWS rows.
+
+    Native datetimes rank first, then text in one regular date format, then
+    whole-number years, then ordered numbers; date-like names and monotonic
+    values add to a column's score. The result is remembered per dataset
+    (content hash and parse options), so reruns do not score again.
+    """
+    with _detections_lock:
+        if dataset.key in _detections:
+            _detections.move_to_end(dataset.key)
+            return _detections[dataset.key]
+
+    if sample is None:
+        sample = dataset.head(DATE_SAMPLE_ROWS)
+    best = None
+    for column in sample.columns:
+        try:
+            candidate = _score_column(column, sample[column])
+        except (TypeError, ValueError, OverflowError) as e:
+            logger.info(f"Skipping column {column} in date detection: {e}")
+            continue
+        if candidate is not None and (best is None or candidate.score > best.score):
+            best = candidate
+    if best is None:
+        best = DateColumn(SYNTHETIC_DATE_COLUMN, "synthetic")
+    logger.info(f"Date column for {dataset.name}: {best}")
+
+    with _detections_lock:
+        _detections[dataset.key] = best
+        while len(_detections) > DETECTIONS_MEMO_SIZE:
+            _detections.popitem(last=False)
+    return best
+
+
+def _daily_range(rows):
+    return pd.date_range(start=SYNTHETIC_START, periods=rows, freq="D")
+
+
+def _convert(dataset, detection):
+    """The converted date column as a one-column frame (synthetic ranges included)."""
+    if detection.kind == "synthetic":
+        return pd.DataFrame({detection.column: _daily_range(dataset.num_rows)})
+    values = dataset.frame([detection.column])[detection.column]
+    if detection.kind == "datetime":
+        converted = values
+    elif detection.kind == "text":
+        converted = _parse_text_dates(values.astype("string"), detection.date_format)
+    elif detection.kind == "year":
+        converted = _year_dates(values)
+    else:
+        converted = _daily_range(len(values))
+    return pd.DataFrame({detection.column: converted})
+
+
+# Function to build the two-column frame a forecast needs, converting the date column once per dataset
+def forecast_frame(dataset, detection, target_col):
+    """
+    Frame with the converted date column and `target_col`, loading only those columns.
+
+    The converted dates are cached per dataset in the frame cache, so the
+    conversion runs once however often the chart reruns, and neither the
+    cached source frame nor other sessions' copies are touched. Daily
+    ranges too long to represent fall back to the first
+    SYNTHETIC_FALLBACK_ROWS rows, as before.
+    """
+    options = dict(dataset.options, derived="dates", column=detection.column, kind=detection.kind, format=detection.date_format)
+    try:
+        dates = get_frame_cache().get_or_load(dataset.digest, options, lambda: _convert(dataset, detection))
+        frame = dataset.frame([target_col])
+    except pd.errors.OutOfBoundsDatetime:
+        logger.info(f"Daily range for {dataset.name} overflows, using the first {SYNTHETIC_FALLBACK_ROWS} rows")
+        frame = dataset.head(SYNTHETIC_FALLBACK_ROWS)[[target_col]]
+        dates = pd.DataFrame({detection.column: _daily_range(len(frame))})
+    frame = frame.reset_index(drop=True)
+    frame.insert(0, detection.column, dates[detection.column].reset_index(drop=True).iloc[:len(frame)])
+    return frame
@@ -4,12 +4,17 @@ import pickle
 import logging
 import time
 import sys
-from sqlalchemy import create_engine, Column, Integer, String, Text, LargeBinary, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, ForeignKey, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from dotenv import load_dotenv, find_dotenv
 
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.db_pool import get_db_pool
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,9 +37,9 @@ DB_NAME = os.getenv('DB_NAME', 'postgres')
 # Print connection details (password obscured)
 logger.info(f"Database config: USER={DB_USER}, HOST={DB_HOST}, PORT={DB_PORT}, DB={DB_NAME}")
 
-# Create SQLAlchemy engine
+# SQLAlchemy engine on the shared connection pool (DATABASE_URL is only shown for troubleshooting)
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+engine = get_db_pool().engine
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
 
@@ -0,0 +1,118 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parsed DataFrames kept in memory for the whole process (override through the environment)
+FRAME_CACHE_MAX_MB = float(os.getenv("FRAME_CACHE_MAX_MB", "512"))
+
+
+class FrameCache:
+    """
+    Process-wide cache of parsed DataFrames, shared by every session.
+
+    Entries are keyed by the upload's content hash plus the parse options,
+    so the same file parsed the same way is read once per process no
+    matter how many users open it or how often Streamlit reruns. Reads
+    return a copy, so callers can modify their frame freely without
+    corrupting the cached one. The least recently used frames are evicted
+    once their combined memory exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=int(FRAME_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()    # key -> (frame, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}               # key -> lock held while that key is parsed
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(digest, options):
+        """Cache key for content `digest` parsed with the `options` dict."""
+        return (digest, tuple(sorted((name, str(value)) for name, value in options.items())))
+
+    def get(self, key):
+        """Copy of the cached frame, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+        return entry[0].copy()
+
+    def shape(self, key):
+        """(column names, row count) of the cached frame without copying it, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[0].columns), len(entry[0])
+
+    def put(self, key, frame):
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            logger.info(f"Not caching a {size / 1e6:.1f}MB frame, larger than the whole cache")
+            return
+        frame = frame.copy()
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (frame, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.counters["evictions"] += 1
+
+    def get_or_load(self, digest, options, loader):
+        """
+        Cached frame for (digest, options), calling `loader()` to parse it on a miss.
+
+        Concurrent misses for the same key wait for the first parse instead of repeating it.
+        """
+        key = self.make_key(digest, options)
+        frame = self.get(key)
+        if frame is not None:
+            return frame
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            frame = self.get(key)
+            if frame is not None:
+                return frame
+            with self._lock:
+                self.counters["misses"] += 1
+            try:
+                frame = loader()
+                self.put(key, frame)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return frame
+
+    def stats(self):
+        """Hit/miss counters plus the current size."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["memory_bytes"] = self._bytes
+        return stats
+
+
+_frame_cache = None
+_frame_cache_lock = threading.Lock()
+
+def get_frame_cache():
+    """Process-wide frame cache."""
+    global _frame_cache
+    with _frame_cache_lock:
+        if _frame_cache is None:
+            _frame_cache = FrameCache()
+        return _frame_cache
@@ -3,10 +3,16 @@ import time
 import os
 import jwt
 from streamlit_javascript import st_javascript
-import psycopg2
 import logging
+import sys
 from dotenv import load_dotenv
 
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.assets import static_url
+from common.db_pool import get_db_pool
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +22,7 @@ load_dotenv()
 
 # Get secret key from environment variables
 SECRET_KEY = os.getenv("SECRET_KEY")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def login_page():
     st.set_page_config(page_title="Login - Data Analysis & Forecasting", page_icon="🔐")
@@ -24,6 +31,12 @@ def login_page():
     st.markdown(
         """
         <style>
+        .center-logo {
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            margin-bottom: 20px;
+        }
         .login-container {
             display: flex;
             flex-direction: column;
@@ -82,10 +95,11 @@ def login_page():
                 # Token is invalid, proceed with login
                 pass
     
-    # 📸 Add Logo
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        st.image("logo.png", width=200)
+    # 📸 Add Logo (served from static/, cached by the browser; centered by the .center-logo rule above)
+    st.markdown(
+        f'<div class="center-logo"><img src="{static_url(APP_DIR, "logo.png")}" width="200"></div>',
+        unsafe_allow_html=True
+    )
     
     # Login form in a centered container
     st.markdown("<div class='login-container'>", unsafe_allow_html=True)
@@ -102,14 +116,10 @@ def login_page():
             st.error("Please enter both email and password")
         else:
             # Implement authentication logic here
+            conn = None
             try:
-                # Connect to database
-                conn = psycopg2.connect(
-                    host=os.getenv("DB_HOST"),
-                    user=os.getenv("DB_USER"),
-                    password=os.getenv("DB_PASSWORD"),
-                    dbname=os.getenv("DB_NAME")
-                )
+                # Check out a pooled database connection
+                conn = get_db_pool().connect()
                 cursor = conn.cursor()
                 
                 # Query for the user
@@ -149,11 +159,13 @@ def login_page():
                     )
                 else:
                     st.error("❌ Invalid email or password")
-                
-                conn.close()
             except Exception as e:
                 logger.error(f"Login error: {str(e)}")
                 st.error(f"❌ Error during login: {str(e)}")
+            finally:
+                # Return the connection to the pool
+                if conn:
+                    conn.close()
     
     st.markdown("</div>", unsafe_allow_html=True)  # Close login-form div
     
@@ -4,16 +4,25 @@ import numpy as np
 import matplotlib.pyplot as plt
 import json
 import os
-import chardet
-import hashlib
-import pdfplumber
 import time
 import logging
+import sys
 import psycopg2
 from dotenv import load_dotenv
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import LabelEncoder
+
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bedrock_gateway import get_bedrock_gateway
+from common.assets import stylesheet_tag, static_url
+from common.db_pool import get_db_pool
+from upload_ingest import ingest_upload, MAX_UPLOAD_MB
+from upload_readers import parse_upload, parse_options, excel_sheet_names
+from column_store import UploadedDataset
+from date_detector import detect_date_column, forecast_frame, DATE_SAMPLE_ROWS
 from auth import init_session_state, check_auth, sign_out, increment_usage, check_usage_limit, DATA_DIR, update_user_in_db, set_subscription_expiration, get_premium_status, require_auth
 from chatbot import chatbot_section  
 from prophet import Prophet
@@ -23,7 +32,6 @@ from razorpay_payment import RazorpayPayment, display_payment_interface
 from streamlit_javascript import st_javascript
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
-import boto3
 import psycopg2
 import streamlit.components.v1 as components
 
@@ -58,6 +66,7 @@ if "token" in st.query_params and st.query_params.get("token") == "None":
 # Load environment variables early to get SECRET_KEY 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Initialize session state early
 init_session_state()
@@ -169,17 +178,11 @@ if "payment" in st.query_params and st.query_params.get("payment") == "success"
                 # Log connection attempt
                 logger.info(f"Attempting database connection (attempt {attempt + 1}/{max_retries})")
                 
-                # Create connection
-                conn = psycopg2.connect(
-                    host=os.getenv("DB_HOST"),
-                    user=os.getenv("DB_USER"),
-                    password=os.getenv("DB_PASSWORD"),
-                    dbname=os.getenv("DB_NAME"),
-                    connect_timeout=10  # Increased timeout
-                )
+                # Check out a pooled connection
+                conn = get_db_pool().connect()
                 
                 # Log connection success
-                logger.info("Database connection established successfully")
+                logger.info("Database connection checked out successfully")
                 
                 cursor = conn.cursor()
                 
@@ -267,7 +270,7 @@ if "payment" in st.query_params and st.query_params.get("payment") == "success"
                 if conn:
                     try:
                         conn.close()
-                        logger.info("Database connection closed")
+                        logger.info("Database connection returned to pool")
                     except Exception as close_error:
                         logger.error(f"Error closing database connection: {str(close_error)}")
         
@@ -639,18 +642,8 @@ if payment_success == "success" and txn_id and not st.session_state.payment_proc
         db_user = os.getenv("DB_USER")
         logger.info(f"Attempting database connection to {db_host}/{db_name} as {db_user}")
         
-        # Try connection with explicit parameters
-        conn = psycopg2.connect(
-            host=db_host,
-            database=db_name,
-            user=db_user,
-            password=os.getenv("DB_PASSWORD"),
-            port=5432,  # Add explicit port
-            connect_timeout=10  # Increased timeout
-        )
-        
-        # Set autocommit to false for transaction control
-        conn.autocommit = False
+        # Check out a pooled connection (pooled connections are never autocommit)
+        conn = get_db_pool().connect()
         
         cursor = conn.cursor()
         
@@ -717,7 +710,7 @@ if payment_success == "success" and txn_id and not st.session_state.payment_proc
         if conn:
             try:
                 conn.close()
-                logger.info("Database connection closed successfully")
+                logger.info("Database connection returned to pool")
             except Exception as close_error:
                 logger.error(f"Error closing database connection: {str(close_error)}")
                 
@@ -864,74 +857,15 @@ razorpay_payment = RazorpayPayment(
     description=RAZORPAY_DESCRIPTION
 )
 
-# 📸 Add Company Logo at the Top
-st.markdown(
-    """
-    <style>
-    .center-logo {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        margin-bottom: 20px;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-# 📸 Add Logo as Image (Centered Properly)
-col1, col2, col3 = st.columns([1, 1, 1])  # Use 1:2:1 ratio for perfect centering
-with col2:
-    st.image("logo.png", width=275)
-
-# 📚 Load CSS for Custom Styling
-def load_css(styles):
-    with open(styles, "r") as f:
-        css_styles = f.read()
-        st.markdown(f"<style>{css_styles}</style>", unsafe_allow_html=True)
-
-# Add custom CSS for centered title
+# 📚 Theme is inlined from static/ (read once per process); the logo is served from static/
 st.markdown(
-    """
-    <style>
-    .title-container {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        margin-bottom: 1rem;
-    }
-    .title-text {
-        text-align: center;
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #17a7e0;
-    }
-    /* Hide the default file size limit text - multiple selectors for different elements */
-    .uploadedFile:first-child ~ small,
-    .stFileUploader > section > div > small,
-    .stFileUploader [data-testid="stFileUploadDropzone"] > div + div,
-    div[data-testid="stFileUploadDropzone"] > div:nth-child(2),
-    .stFileUploader p:nth-child(2),
-    .stFileUploader small, 
-    [data-testid="stFileUploadDropzone"] p + p,
-    [data-testid="stFileUploadDropzone"] > div > p:not(:first-child),
-    [data-testid="stFileUploadDropzone"] small,
-    .stFileUploader .css-ysnqb2,
-    .stFileUploader div + p {
-        display: none !important;
-        visibility: hidden !important;
-        height: 0 !important;
-        padding: 0 !important;
-        margin: 0 !important;
-        opacity: 0 !important;
-    }
-    </style>
+    f"""
+    {stylesheet_tag(APP_DIR, "styles.css")}
+    <div class="center-logo"><img src="{static_url(APP_DIR, "logo.png")}" width="275"></div>
     """,
     unsafe_allow_html=True
 )
 
-load_css("styles.css")
-
 # 🔥 App Title with centered styling
 st.markdown(
     """
@@ -950,6 +884,7 @@ required_session_keys = {
     "user_name": st.session_state.get("user_name", "Guest"),
     "premium_user": False,
     "chat_history": [],
+    "ingested_uploads": {},     # Uploader file_id -> IngestedUpload, so reruns skip re-reading and hashing
 }
 
 for key, default_value in required_session_keys.items():
@@ -964,22 +899,12 @@ if not require_auth():
 
 logger.info("Authentication successful, continuing with app")
 
-# 📍 AWS Bedrock Client Initialization
-def get_bedrock_client():
-    try:
-        return boto3.client(service_name="bedrock-runtime", region_name="ap-south-1")
-    except ImportError:
-        logger.warning("boto3 not installed, Bedrock functionality will not work")
-        return None
-    except Exception as e:
-        logger.error(f"Error initializing Bedrock client: {e}")
-        return None
-
+# 📍 AWS Bedrock Gateway (one pooled client per process, created on the first request)
 try:
-    bedrock_client = get_bedrock_client()
+    bedrock_gateway = get_bedrock_gateway()
 except Exception as e:
-    logger.error(f"Could not initialize Bedrock client: {e}")
-    bedrock_client = None
+    logger.error(f"Could not initialize Bedrock gateway: {e}")
+    bedrock_gateway = None
 
 # Keep track of uploaded files to detect new uploads
 if "tracked_files" not in st.session_state:
@@ -988,11 +913,11 @@ if "tracked_files" not in st.session_state:
 # 📥 Sidebar for Multiple File Uploads with Progress Bar
 st.sidebar.header("📂 Upload Your Datasets")
 
-# Add custom text to show 5MB limit
+# Add custom text to show the upload size limit
 st.sidebar.markdown(
-    """
+    f"""
     <div style="color: #888888; font-size: 14px; margin-bottom: 10px;">
-    Maximum file size: 5MB
+    Maximum file size: {MAX_UPLOAD_MB}MB
     </div>
     """,
     unsafe_allow_html=True
@@ -1063,8 +988,8 @@ if st.sidebar.button("💳 Upgrade to Premium", use_container_width=True):
     components.html(js, height=0, scrolling=False)
     
 
-# 📚 Load Uploaded Files
-dataframes = []
+# 📚 Load Uploaded Files (lazy handles: data is read per column when needed)
+datasets = []
 file_names = []
 
 # Check if user has reached their usage limit before showing the uploader
@@ -1073,11 +998,17 @@ has_reached_limit = not check_usage_limit()
 # Only show file uploader if user has not reached their limit
 if not has_reached_limit:
     uploaded_files = st.sidebar.file_uploader(
-        "Upload Files (CSV, Excel, JSON, Parquet, PDF)",
-        type=["csv", "xls", "xlsx", "json", "parquet", "pdf"],  
+        "Upload Files (CSV, Excel, JSON, NDJSON, Parquet, PDF)",
+        type=["csv", "xls", "xlsx", "json", "jsonl", "ndjson", "parquet", "pdf"],  
         accept_multiple_files=True
     )
 
+    # Forget ingested files that were removed from the uploader
+    current_file_ids = {uploaded_file.file_id for uploaded_file in uploaded_files or []}
+    for file_id in list(st.session_state.ingested_uploads):
+        if file_id not in current_file_ids:
+            del st.session_state.ingested_uploads[file_id]
+
     # Progress Bar for File Upload
     progress_bar = st.sidebar.progress(0)
 
@@ -1088,22 +1019,26 @@ if not has_reached_limit:
         # First validate all files
         for uploaded_file in uploaded_files:
             file_name = uploaded_file.name
-            file_size = len(uploaded_file.getvalue())  # Get file size in bytes
+            file_size = uploaded_file.size  # Get file size in bytes without touching the content
             
-            # 📏 Check File Size (Limit: 5MB)
-            if file_size > 5 * 1024 * 1024:  # 5MB limit
-                st.sidebar.error(f"❌ {file_name} exceeds 5MB size limit and will not be processed.")
+            # 📏 Check File Size (Limit: MAX_UPLOAD_MB)
+            if file_size > MAX_UPLOAD_MB * 1024 * 1024:
+                st.sidebar.error(f"❌ {file_name} exceeds {MAX_UPLOAD_MB}MB size limit and will not be processed.")
             else:
                 valid_files.append(uploaded_file)
         
         # Process only valid files
         for i, uploaded_file in enumerate(valid_files):
             file_name = uploaded_file.name
-            file_size = len(uploaded_file.getvalue())
+
+            # Read, hash and detect the encoding in a single pass over the bytes, once per uploaded file
+            upload = st.session_state.ingested_uploads.get(uploaded_file.file_id)
+            if upload is None:
+                upload = ingest_upload(uploaded_file)
+                st.session_state.ingested_uploads[uploaded_file.file_id] = upload
             
             # Check if this is a new file we haven't tracked yet
-            file_hash = hashlib.md5(uploaded_file.getvalue()).hexdigest()
-            file_identifier = f"{file_name}_{file_hash}"
+            file_identifier = f"{file_name}_{upload.digest}"
             
             # If this is a new file, count it as usage
             if file_identifier not in st.session_state.tracked_files:
@@ -1119,44 +1054,24 @@ if not has_reached_limit:
                     st.session_state.show_payment_page = True
                     st.rerun()
             
-            # 📏 Check File Size (Limit: 5MB)
-            if file_size > 5 * 1024 * 1024:  # 5MB limit
-                st.sidebar.error(f"❌ {file_name} exceeds 5MB size limit. Skipping file.")
-                continue
             st.sidebar.write(f"✅ {file_name} uploaded successfully.")
             progress_bar.progress((i + 1) / total_files)
 
-            # Load CSV/Excel/JSON/Parquet/PDF
-            # Reset file pointer after calculating hash
-            uploaded_file.seek(0)
-            raw_data = uploaded_file.read()
-            encoding_type = chardet.detect(raw_data)["encoding"]
-            uploaded_file.seek(0)
-
+            # Load CSV/Excel/JSON/Parquet/PDF, parsed once and kept in the column cache across reruns, sessions and restarts
             try:
-                if file_name.endswith(".csv"):
-                    df = pd.read_csv(uploaded_file, encoding=encoding_type, encoding_errors="replace")
-                elif file_name.endswith((".xls", ".xlsx")):
-                    df = pd.read_excel(uploaded_file)
-                elif file_name.endswith(".json"):
-                    df = pd.read_json(uploaded_file)
-                elif file_name.endswith(".parquet"):
-                    df = pd.read_parquet(uploaded_file)
-                elif file_name.endswith(".pdf"):
-                    # 📄 Extract Text from PDF Using pdfplumber
-                    with pdfplumber.open(uploaded_file) as pdf:
-                        text = ""
-                        for page in pdf.pages:
-                            text += page.extract_text()
-
-                    # 📄 Convert PDF Text to DataFrame (Line by Line)
-                    lines = text.split("\n")
-                    df = pd.DataFrame({"Text": lines})
-                else:
-                    st.sidebar.error(f"❌ Unsupported file format: {file_name}")
-                    continue
-
-                dataframes.append(df)
+                # 📑 Workbooks with several sheets: only the chosen sheet is parsed
+                sheet = None
+                if file_name.endswith((".xls", ".xlsx")):
+                    sheets = excel_sheet_names(upload)
+                    if len(sheets) > 1:
+                        sheet = st.sidebar.selectbox(f"Sheet in {file_name}", sheets, key=f"sheet_{upload.digest}")
+                    elif sheets:
+                        sheet = sheets[0]
+                dataset = UploadedDataset(
+                    file_name, upload.digest, parse_options(upload, sheet),
+                    lambda upload=upload, sheet=sheet: parse_upload(upload, sheet)
+                )
+                datasets.append(dataset)
                 file_names.append(file_name)
             except Exception as e:
                 st.sidebar.error(f"❌ Error loading {file_name}: {str(e)}")
@@ -1172,8 +1087,8 @@ else:
     else:
         st.warning("⚠️ You've reached your free usage limit (6 uses). Please upgrade to continue using the application.")
     
-    # Clear any loaded dataframes and filenames to prevent access
-    dataframes = []
+    # Clear any loaded datasets and filenames to prevent access
+    datasets = []
     file_names = []
     
     # Force show the payment page
@@ -1184,15 +1099,15 @@ else:
 # Only process files and show visualizations if user has not reached their limit
 if not has_reached_limit:
     # ✅ Dropdown to Select File and View Option
-    if dataframes:
+    if datasets:
         selected_file = st.selectbox(
             "📂 Select a file to view",
             file_names,
             index=0
         )
 
-        # Get the corresponding dataframe
-        selected_df = dataframes[file_names.index(selected_file)]
+        # Get the corresponding dataset
+        selected_dataset = datasets[file_names.index(selected_file)]
 
         # Track if chart view has been counted for usage in this session
         if "chart_view_counted" not in st.session_state:
@@ -1207,9 +1122,9 @@ if not has_reached_limit:
         if option == "📋 Preview":
             st.write(f"### 📋 Preview of `{selected_file}`")
             if selected_file.endswith(".pdf"):
-                st.text_area("📄 PDF Content", "\n".join(selected_df["Text"].tolist()), height=400)
+                st.text_area("📄 PDF Content", "\n".join(selected_dataset.frame(["Text"])["Text"].tolist()), height=400)
             else:
-                st.dataframe(selected_df.head(50))
+                st.dataframe(selected_dataset.head(50))
 
         elif option == "📈 Chart":
             # Count chart view for usage if not already counted in this session
@@ -1226,121 +1141,15 @@ if not has_reached_limit:
                     st.session_state.show_payment_page = True
                     st.rerun()
             
-            # Replace the existing date column detection code with this enhanced version
-            date_column_keywords = ["year", "date", "age", "month", "time", "period", "quarter", "yr", "day"]
-            numeric_time_indicators = ["year", "age", "period", "Year", "Age", "yr"]
-            
-            # Initialize date_col as None
-            date_col = None
-            
-            # First try to find datetime columns
-            for col in selected_df.columns:
-                try:
-                    col_lower = col.lower()
-                    
-                    # Check if column name contains date-related keywords
-                    if any(keyword in col_lower for keyword in date_column_keywords):
-                        # For numeric columns that represent time (like year or age)
-                        if any(indicator in col_lower for indicator in numeric_time_indicators):
-                            if selected_df[col].dtype in ['int64', 'float64']:
-                                date_col = col
-                                # Convert numeric years to datetime
-                                try:
-                                    # Check if values are within reasonable year range
-                                    if selected_df[col].min() >= 1000 and selected_df[col].max() <= 3000:
-                                        selected_df[col] = pd.to_datetime(selected_df[col], format='%Y')
-                                    else:
-                                        # Create date range based on index
-                                        selected_df[col] = pd.date_range(
-                                            start='2000-01-01',
-                                            periods=len(selected_df),
-                                            freq='D'
-                                        )
-                                except Exception as e:
-                                    # Fallback to date range if conversion fails
-                                    selected_df[col] = pd.date_range(
-                                        start='2000-01-01',
-                                        periods=len(selected_df),
-                                        freq='D'
-                                    )
-                                break
-                        else:
-                            # Try converting to datetime for date-like columns
-                            try:
-                                selected_df[col] = pd.to_datetime(selected_df[col], errors="coerce")
-                                if selected_df[col].notna().sum() > 0:
-                                    date_col = col
-                                    break
-                            except Exception:
-                                continue
-                except Exception:
-                    continue
-            
-            # If no date column found, check if any existing column could be a date
-            if date_col is None:
-                for col in selected_df.columns:
-                    try:
-                        # Try to convert common date formats
-                        selected_df[col] = pd.to_datetime(selected_df[col], errors="coerce")
-                        if selected_df[col].notna().sum() > len(selected_df) * 0.5:  # At least 50% valid dates
-                            date_col = col
-                            break
-                    except Exception:
-                        continue
-            
-            # If still no date column found, look for numeric columns that could represent time series
-            if date_col is None:
-                numeric_cols = selected_df.select_dtypes(include=[np.number]).columns
-                
-                # First check for columns that look like years
-                for col in numeric_cols:
-                    values = selected_df[col].dropna().unique()
-                    # Check if values look like years (between 1900 and 2100)
-                    if len(values) > 0 and values.min() >= 1900 and values.max() <= 2100:
-                        date_col = col
-                        try:
-                            selected_df[col] = pd.to_datetime(selected_df[col], format='%Y')
-                            break
-                        except Exception:
-                            continue
-                
-                # If still no date found, look for any sequential numeric column
-                if date_col is None:
-                    for col in numeric_cols:
-                        # Check if the column is sorted or has regular intervals
-                        if selected_df[col].is_monotonic_increasing:
-                            date_col = col
-                            try:
-                                # Create a datetime index with daily frequency
-                                selected_df[col] = pd.date_range(
-                                    start='2000-01-01',
-                                    periods=len(selected_df),
-                                    freq='D'
-                                )
-                                break
-                            except pd.errors.OutOfBoundsDatetime:
-                                # If dataset too large, use a smaller subset
-                                st.warning(f"Dataset too large to create date range. Using first 1000 rows.")
-                                selected_df = selected_df.head(1000)
-                                selected_df[col] = pd.date_range(
-                                    start='2000-01-01',
-                                    periods=len(selected_df),
-                                    freq='D'
-                                )
-                                break
-            
-            # If all else fails, create a synthetic date column
-            if date_col is None:
+            # 📅 Pick the date column from a sample of rows (remembered per file) and read only the columns the chart needs
+            sample_df = selected_dataset.head(DATE_SAMPLE_ROWS)
+            date_detection = detect_date_column(selected_dataset, sample_df)
+            date_col = date_detection.column
+            if date_detection.kind == "synthetic":
                 st.info("⚠ No suitable data found for forecasting")
-                selected_df['synthetic_date'] = pd.date_range(
-                    start='2000-01-01',
-                    periods=len(selected_df),
-                    freq='D'
-                )
-                date_col = 'synthetic_date'
-            
+
             # Now proceed with forecasting since we've ensured a date column exists
-            numeric_columns = selected_df.select_dtypes(include=[np.number]).columns.tolist()
+            numeric_columns = sample_df.select_dtypes(include=[np.number]).columns.tolist()
             if date_col in numeric_columns:
                 numeric_columns.remove(date_col)
 
@@ -1348,6 +1157,9 @@ if not has_reached_limit:
                 st.error("⚠ No suitable data found for forecasting")
             else:
                 target_col = st.selectbox(f"Select Target Column for `{selected_file}`:", numeric_columns)
+                selected_df = forecast_frame(selected_dataset, date_detection, target_col)
+                if len(selected_df) < selected_dataset.num_rows:
+                    st.warning(f"Dataset too large to create date range. Using first {len(selected_df)} rows.")
 
                 # 📊 Forecasting Preparation
                 # Use the last available date from the dataset to start the forecasting
@@ -1467,10 +1279,10 @@ if not has_reached_limit:
                     st.error(f"❌ Error preparing forecast: {str(e)}")
 
 # Show the chatbot only if files have been uploaded and user has not reached their limit
-if dataframes and not has_reached_limit:
+if datasets and not has_reached_limit:
     st.write("")
-    if bedrock_client:
-        chatbot_section(dataframes, file_names, bedrock_client)
+    if bedrock_gateway:
+        chatbot_section(datasets, file_names, bedrock_gateway)
     else:
         st.warning("⚠️ Amazon Bedrock client not initialized. AI assistant is unavailable.")
         st.info("To enable the AI assistant, install boto3 and configure AWS credentials.")
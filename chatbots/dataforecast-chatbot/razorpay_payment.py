@@ -6,7 +6,8 @@ import logging
 import streamlit as st
 import os
 from auth import update_user_in_db
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from common.db_pool import get_db_pool
 import os
 from dotenv import load_dotenv
 # Set up logging
@@ -442,20 +443,8 @@ def display_payment_interface(razorpay_payment):
                 logger.info("Payment verified. Updating user to premium status.")
                 update_user_in_db()                
         
-                # Load environment variables
-                load_dotenv()
-                
-                # Get database connection details
-                DB_USER = os.getenv('DB_USER', 'postgres')
-                DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
-                DB_HOST = os.getenv('DB_HOST', 'localhost')
-                DB_PORT = os.getenv('DB_PORT', '5432')
-                DB_NAME = os.getenv('DB_NAME', 'postgres2')
-                
-                # Create engine and check user status
-                DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-                engine = create_engine(DATABASE_URL)
-                with engine.connect() as connection:
+                # Check user status on the shared pooled engine (DB_NAME defaults to "postgres2" here, as it always has)
+                with get_db_pool(os.getenv('DB_NAME', 'postgres2')).engine.connect() as connection:
                     username = st.session_state.username if "username" in st.session_state else "default_user"
                     result = connection.execute(text(
                         "SELECT paid_user FROM users WHERE username = :username"
@@ -551,25 +540,8 @@ def display_payment_interface(razorpay_payment):
             # Save premium status to database
             logger.info("Payment verified. Updating user to premium status (auto-update).")
             update_user_in_db()
-            # Double-check that the update was successful
-            from sqlalchemy import create_engine, text
-            import os
-            from dotenv import load_dotenv
-            
-            # Load environment variables
-            load_dotenv()
-            
-            # Get database connection details
-            DB_USER = os.getenv('DB_USER', 'postgres')
-            DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
-            DB_HOST = os.getenv('DB_HOST', 'localhost')
-            DB_PORT = os.getenv('DB_PORT', '5432')
-            DB_NAME = os.getenv('DB_NAME', 'postgres2')
-            
-            # Create engine and check user status
-            DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-            engine = create_engine(DATABASE_URL)
-            with engine.connect() as connection:
+            # Double-check that the update was successful on the shared pooled engine (DB_NAME defaults to "postgres2" here)
+            with get_db_pool(os.getenv('DB_NAME', 'postgres2')).engine.connect() as connection:
                 username = st.session_state.username if "username" in st.session_state else "default_user"
                 result = connection.execute(text(
                     "SELECT paid_user FROM users WHERE username = :username"
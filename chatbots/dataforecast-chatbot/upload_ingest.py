@@ -0,0 +1,94 @@
+import io
+import os
+import codecs
+import hashlib
+import logging
+from chardet.universaldetector import UniversalDetector
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_BYTES = 1024 * 1024            # Hash / UTF-8 check granularity
+ENCODING_SAMPLE_BYTES = 1024 * 1024         # Most bytes fed to the encoding detector
+ENCODING_FEED_BYTES = 64 * 1024             # Detector feed size; it usually decides within a few
+TEXT_EXTENSIONS = (".csv", ".json", ".jsonl", ".ndjson")     # Formats that need a text encoding
+
+# Largest accepted upload; keep in line with Streamlit's server.maxUploadSize (Dockerfile)
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "200"))
+
+
+class IngestedUpload:
+    """
+    One uploaded file after a single pass over its bytes.
+
+    `data` is the upload's own bytes object and `view` a memoryview over
+    it, so nothing is copied. `buffer()` hands readers a BytesIO that shares
+    the same bytes instead of copying them.
+    """
+
+    def __init__(self, name, data, digest, encoding):
+        self.name = name
+        self.data = data
+        self.view = memoryview(data)
+        self.size = len(data)
+        self.digest = digest        # SHA-256 of the content
+        self.encoding = encoding    # Text encoding for CSV/JSON, None for binary formats
+
+    def buffer(self):
+        """Fresh file-like object over the upload (BytesIO shares an unmodified bytes object)."""
+        return io.BytesIO(self.data)
+
+
+# Function to detect the encoding of non-UTF-8 text from a bounded sample
+def detect_encoding(view, sample_bytes=ENCODING_SAMPLE_BYTES):
+    detector = UniversalDetector()
+    sample = view[:sample_bytes]
+    for start in range(0, len(sample), ENCODING_FEED_BYTES):
+        detector.feed(sample[start:start + ENCODING_FEED_BYTES])
+        if detector.done:
+            break
+    detector.close()
+    return detector.result.get("encoding") or "utf-8"
+
+
+# Function to read, hash and (for text formats) validate an upload in one pass
+def ingest_upload(uploaded_file):
+    """
+    Read an uploaded file once and return an IngestedUpload.
+
+    The bytes are walked in chunks through a memoryview, feeding the hash
+    and an incremental UTF-8 decoder together. Only when the text turns out
+    not to be UTF-8 does a UniversalDetector look at a bounded sample,
+    stopping as soon as it is confident.
+    """
+    name = uploaded_file.name
+    data = uploaded_file.getvalue()
+    view = memoryview(data)
+    hasher = hashlib.sha256()
+    is_text = name.lower().endswith(TEXT_EXTENSIONS)
+    decoder = codecs.getincrementaldecoder("utf-8")() if is_text else None
+
+    for start in range(0, len(view), INGEST_CHUNK_BYTES):
+        chunk = view[start:start + INGEST_CHUNK_BYTES]
+        hasher.update(chunk)
+        if decoder is not None:
+            try:
+                decoder.decode(chunk)
+            except UnicodeDecodeError:
+                decoder = None
+
+    encoding = None
+    if is_text:
+        if decoder is not None:
+            try:
+                decoder.decode(b"", final=True)
+                encoding = "utf-8-sig" if data.startswith(codecs.BOM_UTF8) else "utf-8"
+            except UnicodeDecodeError:
+                pass
+        if encoding is None:
+            encoding = detect_encoding(view)
+            logger.info(f"{name} is not UTF-8, detected {encoding}")
+
+    return IngestedUpload(name, data, hasher.hexdigest(), encoding)
+
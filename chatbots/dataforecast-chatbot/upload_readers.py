@@ -0,0 +1,195 @@
+import io
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+import pdfplumber
+
+# pyarrow parses CSV and NDJSON multi-threaded straight into columns; without it pandas does all the reading
+try:
+    import pyarrow as pa
+    import pyarrow.csv
+    import pyarrow.json
+except ImportError:
+    pa = None
+
+# python-calamine reads Excel far faster than openpyxl; pandas falls back to its default engine without it
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARSER_VERSION = "3"                  # Bump when parsing changes so cached frames are rebuilt
+ARROW_BLOCK_BYTES = 4 * 1024 * 1024   # pyarrow read block size (also how much it uses to infer types)
+CSV_SAMPLE_ROWS = 10000               # Rows pandas looks at to pick dtypes before the full read
+CSV_CHUNK_ROWS = 200000               # Rows per pandas chunk, bounding the tokenizer's memory
+JSON_CHUNK_ROWS = 100000              # NDJSON lines per pandas chunk
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+
+_sheet_names = OrderedDict()          # Content hash -> sheet names, for the sheet picker on reruns
+_sheet_names_lock = threading.Lock()
+SHEET_NAMES_MEMO_SIZE = 256
+
+
+# Function to describe how an upload is parsed (part of its cache key)
+def parse_options(upload, sheet=None):
+    options = {
+        "parser": PARSER_VERSION,
+        "format": os.path.splitext(upload.name.lower())[1],
+        "encoding": upload.encoding,
+    }
+    if sheet is not None:
+        options["sheet"] = sheet
+    return options
+
+
+# Function to parse an ingested upload into a DataFrame
+def parse_upload(upload, sheet=None):
+    file_name = upload.name.lower()
+    if file_name.endswith(".csv"):
+        return read_csv(upload)
+    if file_name.endswith((".xls", ".xlsx")):
+        return read_excel(upload, sheet)
+    if file_name.endswith((".json",) + NDJSON_EXTENSIONS):
+        return read_json(upload)
+    if file_name.endswith(".parquet"):
+        return pd.read_parquet(upload.buffer())
+    if file_name.endswith(".pdf"):
+        return read_pdf(upload)
+    raise ValueError(f"Unsupported file format: {upload.name}")
+
+
+def _arrow_to_pandas(table):
+    # self_destruct frees each Arrow column as soon as it is converted, keeping peak memory near one copy
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _arrow_encoding(encoding):
+    # pyarrow decodes UTF-8 natively (skipping a BOM) and transcodes anything else
+    return "utf8" if encoding in (None, "utf-8", "utf-8-sig") else encoding
+
+
+# Function to read a CSV with pyarrow, falling back to chunked pandas
+def read_csv(upload):
+    if pa is not None:
+        try:
+            table = pa.csv.read_csv(
+                upload.buffer(),
+                read_options=pa.csv.ReadOptions(encoding=_arrow_encoding(upload.encoding), block_size=ARROW_BLOCK_BYTES),
+                # Empty text fields are missing values, as in pandas
+                convert_options=pa.csv.ConvertOptions(strings_can_be_null=True),
+            )
+            return _arrow_to_pandas(table)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, UnicodeDecodeError, LookupError) as e:
+            logger.info(f"pyarrow could not read {upload.name}, using pandas: {e}")
+    return read_csv_chunked(upload)
+
+
+def _sampled_dtypes(sample):
+    """Dtypes to pin for the full read: numeric columns only, as float when the sample has gaps."""
+    dtypes = {}
+    for column, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+            continue
+        dtypes[column] = "float64" if pd.api.types.is_float_dtype(dtype) else dtype
+    return dtypes
+
+
+# Function to read a CSV with pandas in chunks, using dtypes inferred from a sample
+def read_csv_chunked(upload):
+    """
+    Read a CSV with pandas' C parser, chunk by chunk.
+
+    Dtypes for numeric columns are taken from the first CSV_SAMPLE_ROWS
+    rows so the chunks agree and skip per-chunk inference. If a later row
+    breaks the sampled dtypes (text in a numeric column, a gap in an
+    integer column) the file is re-read with full inference.
+    """
+    read_args = {"encoding": upload.encoding, "encoding_errors": "replace"}
+    sample = pd.read_csv(upload.buffer(), nrows=CSV_SAMPLE_ROWS, **read_args)
+    if len(sample) < CSV_SAMPLE_ROWS:
+        return sample
+    try:
+        chunks = pd.read_csv(upload.buffer(), dtype=_sampled_dtypes(sample), chunksize=CSV_CHUNK_ROWS, **read_args)
+        return pd.concat(chunks, ignore_index=True)
+    except (ValueError, TypeError, OverflowError) as e:
+        logger.info(f"Sampled dtypes did not fit all of {upload.name}, re-reading with full inference: {e}")
+        return pd.read_csv(upload.buffer(), low_memory=False, **read_args)
+
+
+# Function to list a workbook's sheets without parsing them
+def excel_sheet_names(upload):
+    with _sheet_names_lock:
+        if upload.digest in _sheet_names:
+            _sheet_names.move_to_end(upload.digest)
+            return _sheet_names[upload.digest]
+    if CalamineWorkbook is not None:
+        names = CalamineWorkbook.from_filelike(upload.buffer()).sheet_names
+    else:
+        with pd.ExcelFile(upload.buffer()) as workbook:
+            names = workbook.sheet_names
+    with _sheet_names_lock:
+        _sheet_names[upload.digest] = names
+        while len(_sheet_names) > SHEET_NAMES_MEMO_SIZE:
+            _sheet_names.popitem(last=False)
+    return names
+
+
+# Function to read one sheet of a workbook with calamine, falling back to pandas' default engine
+def read_excel(upload, sheet=None):
+    sheet = 0 if sheet is None else sheet
+    if CalamineWorkbook is not None:
+        try:
+            return pd.read_excel(upload.buffer(), sheet_name=sheet, engine="calamine")
+        except (ImportError, ValueError) as e:
+            # Older pandas without the calamine engine, or a file calamine cannot handle
+            logger.info(f"calamine could not read {upload.name}, using the default engine: {e}")
+    return pd.read_excel(upload.buffer(), sheet_name=sheet)
+
+
+def _is_ndjson(upload):
+    """NDJSON by extension, or a first line that is a complete JSON object on its own."""
+    if upload.name.lower().endswith(NDJSON_EXTENSIONS):
+        return True
+    head = upload.view[:ARROW_BLOCK_BYTES].tobytes().lstrip()
+    if not head.startswith(b"{"):
+        return False
+    first_line, newline, rest = head.partition(b"\n")
+    if not newline or not rest.strip():
+        return False
+    try:
+        return isinstance(json.loads(first_line.decode(upload.encoding or "utf-8", errors="replace")), dict)
+    except ValueError:
+        return False
+
+
+# Function to read JSON, streaming NDJSON line by line instead of loading it as one document
+def read_json(upload):
+    def text_stream():
+        return io.TextIOWrapper(upload.buffer(), encoding=upload.encoding, errors="replace")
+
+    if not _is_ndjson(upload):
+        return pd.read_json(text_stream())
+    if pa is not None and _arrow_encoding(upload.encoding) == "utf8":
+        try:
+            table = pa.json.read_json(upload.buffer(), read_options=pa.json.ReadOptions(block_size=ARROW_BLOCK_BYTES))
+            return _arrow_to_pandas(table)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            logger.info(f"pyarrow could not read {upload.name}, streaming it with pandas: {e}")
+    with pd.read_json(text_stream(), lines=True, chunksize=JSON_CHUNK_ROWS) as reader:
+        return pd.concat(reader, ignore_index=True)
+
+
+# Function to extract a PDF's text into one row per line
+def read_pdf(upload):
+    with pdfplumber.open(upload.buffer()) as pdf:
+        text = ""
+        for page in pdf.pages:
+            text += page.extract_text()
+    return pd.DataFrame({"Text": text.split("\n")})
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from common.db_pool import get_db_pool
+
+# Answer cache settings (override through the environment)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))      # In-process LRU size
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_DB_MAX_ROWS = int(os.getenv("ANSWER_CACHE_DB_MAX_ROWS", "50000"))
+ANSWER_CACHE_DB_ENABLED = os.getenv("ANSWER_CACHE_DB_ENABLED", "1" if os.getenv("DB_HOST") else "0") == "1"
+ANSWER_CACHE_TABLE = "bbt_answer_cache"
+DB_RETRY_AFTER_SECONDS = 60   # How long to skip Postgres after it fails
+DB_PURGE_EVERY = 100          # Trim expired and excess rows once every this many writes
+
+QUESTION_SPACE_RE = re.compile(r"\s+")
+
+
+def digests_hash(digests):
+    """Order-independent hash of per-document SHA-256 hex digests."""
+    return hashlib.sha256("".join(sorted(digests)).encode("ascii")).hexdigest()
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivially different phrasings share an entry."""
+    return QUESTION_SPACE_RE.sub(" ", question.lower()).strip().rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Two-tier cache of generated answers.
+
+    The first tier is an in-process LRU shared by every session. The second
+    is a Postgres table so answers survive restarts and are shared between
+    replicas. Both tiers expire entries after `ttl_seconds`; the LRU holds at
+    most `max_entries` answers and the table at most `db_max_rows` rows.
+    Postgres writes happen in the background and a failing database is
+    skipped for a while instead of slowing every question down.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 db_enabled=ANSWER_CACHE_DB_ENABLED, db_max_rows=ANSWER_CACHE_DB_MAX_ROWS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_enabled = db_enabled
+        self.db_max_rows = db_max_rows
+        self._entries = OrderedDict()  # key -> (answer, stored_at)
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self._db_failed_at = 0.0
+        self._db_writes = 0
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answer-cache-db") if db_enabled else None
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "db_errors": 0}
+
+    @staticmethod
+    def make_key(document_hash, question, model_id, generation_config):
+        """Cache key for a question about a set of documents under a model and generation config."""
+        config = json.dumps(generation_config, sort_keys=True)
+        raw = "\x1f".join([document_hash, normalize_question(question), model_id, config])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key):
+        """Return the cached answer for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return answer
+                del self._entries[key]
+
+        answer = self._db_get(key)
+        if answer is not None:
+            self._remember(key, answer, now)
+            self._count("db_hits")
+            return answer
+
+        self._count("misses")
+        return None
+
+    def put(self, key, answer):
+        """Store a generated answer under `key`."""
+        self._remember(key, answer, time.time())
+        self._count("stores")
+        if self._db_executor:
+            self._db_executor.submit(self._db_put, key, answer)
+
+    def _remember(self, key, answer, stored_at):
+        with self._lock:
+            self._entries[key] = (answer, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit/miss counters plus the current LRU size."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    # Postgres tier
+
+    def _db_available(self):
+        return self.db_enabled and time.time() - self._db_failed_at >= DB_RETRY_AFTER_SECONDS
+
+    def _db_error(self, action, e):
+        print(f"⚠️ Answer cache could not {action} Postgres, skipping it for {DB_RETRY_AFTER_SECONDS}s: {e}")
+        self._db_failed_at = time.time()
+        self._count("db_errors")
+
+    def _ensure_table(self, cursor):
+        if self._db_ready:
+            return
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ANSWER_CACHE_TABLE} (
+                cache_key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {ANSWER_CACHE_TABLE}_created_at_idx ON {ANSWER_CACHE_TABLE} (created_at)")
+        self._db_ready = True
+
+    def _db_get(self, key):
+        if not self._db_available():
+            return None
+        try:
+            with get_db_pool().connection() as conn, conn.cursor() as cursor:
+                self._ensure_table(cursor)
+                cursor.execute(
+                    f"SELECT answer FROM {ANSWER_CACHE_TABLE} WHERE cache_key = %s AND created_at > now() - %s * interval '1 second'",
+                    (key, self.ttl_seconds)
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self._db_error("read from", e)
+            return None
+
+    def _db_put(self, key, answer):
+        if not self._db_available():
+            return
+        try:
+            with get_db_pool().connection() as conn, conn.cursor() as cursor:
+                self._ensure_table(cursor)
+                cursor.execute(
+                    f"""
+                    INSERT INTO {ANSWER_CACHE_TABLE} (cache_key, answer) VALUES (%s, %s)
+                    ON CONFLICT (cache_key) DO UPDATE SET answer = EXCLUDED.answer, created_at = now()
+                    """,
+                    (key, answer)
+                )
+                self._db_writes += 1
+                if self._db_writes % DB_PURGE_EVERY == 0:
+                    self._db_purge(cursor)
+        except Exception as e:
+            self._db_error("write to", e)
+
+    def _db_purge(self, cursor):
+        """Delete expired rows, then the oldest rows beyond `db_max_rows`."""
+        cursor.execute(
+            f"DELETE FROM {ANSWER_CACHE_TABLE} WHERE created_at <= now() - %s * interval '1 second'",
+            (self.ttl_seconds,)
+        )
+        cursor.execute(
+            f"""
+            DELETE FROM {ANSWER_CACHE_TABLE} WHERE cache_key IN (
+                SELECT cache_key FROM {ANSWER_CACHE_TABLE} ORDER BY created_at DESC OFFSET %s
+            )
+            """,
+            (self.db_max_rows,)
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache():
+    """Process-wide answer cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
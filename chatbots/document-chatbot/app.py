@@ -1,9 +1,22 @@
 import streamlit as st
 import os
-import random
-from extract_text import extract_text
-from bedrockapi import query_bedrock
-import base64
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_text import is_extraction_error
+from ingestion import submit_ingestion, INGESTION_POLL_SECONDS
+from retrieval import BM25Index, fuse_results, RETRIEVAL_TOP_K
+from vector_index import VectorIndex, get_vector_store
+from bedrockapi import build_context_prompt, stream_prompt, map_reduce_stream, model_id, generation_config
+from answer_cache import get_answer_cache, digests_hash
+from document_store import SessionDocumentStore, log_session_usage
+from transcript import Transcript, bubble_html
+from common.assets import stylesheet_tag
+from common.db_pool import get_db_pool
 import time
 import streamlit.components.v1 as components
 from streamlit_javascript import st_javascript
@@ -12,14 +25,12 @@ import jwt
 from jwt import ExpiredSignatureError, InvalidTokenError
 from dotenv import load_dotenv
 import os
-import psycopg2
-from psycopg2 import errors
 import urllib
-from psycopg2.errors import UniqueViolation
 
 load_dotenv()
 st.set_page_config(page_title="Document Chatbot")
 STATIC_DIR = "static"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
@@ -88,13 +99,7 @@ if "payment" in st.query_params and st.query_params.get("payment") == "success"
         # Try to save to database, but continue even if it fails
         conn = None
         try:
-            conn = psycopg2.connect(
-                host=os.getenv("DB_HOST"),
-                user=os.getenv("DB_USER"),
-                password=os.getenv("DB_PASSWORD"),
-                dbname=os.getenv("DB_NAME"),
-                connect_timeout=5  # Add timeout to prevent hanging
-            )
+            conn = get_db_pool().connect()
             cursor = conn.cursor()
             insert_query = """
                 INSERT INTO bbt_tempusers(name, email, phone, app_id, order_id)
@@ -112,7 +117,7 @@ if "payment" in st.query_params and st.query_params.get("payment") == "success"
                 except Exception:
                     pass
         finally:
-            # Always close the connection in the finally block
+            # Always return the connection to the pool in the finally block
             if conn:
                 try:
                     conn.close()
@@ -159,8 +164,24 @@ else:
     # AWS S3 Configuration
     S3_BUCKET = "chatbotbucket-12345"
     s3_client = boto3.client("s3")
-   
+
     os.environ["STREAMLIT_WATCH_FILE"] = "false"
+
+    # Shared pool for archiving uploads to S3 off the request path
+    @st.cache_resource
+    def get_s3_archive_executor():
+        return ThreadPoolExecutor(max_workers=4, thread_name_prefix="s3-archive")
+
+    def archive_to_s3(file_bytes, file_name):
+        """Upload a copy of the document to S3 in the background."""
+        def _upload():
+            try:
+                s3_client.upload_fileobj(io.BytesIO(file_bytes), S3_BUCKET, file_name)
+                print(f"✅ Archived {file_name} to S3 bucket {S3_BUCKET}.")
+            except Exception as e:
+                print(f"❌ Error archiving {file_name} to S3: {e}")
+
+        get_s3_archive_executor().submit(_upload)
    
     name = "Unknown User"  
 
@@ -174,7 +195,12 @@ else:
         "user_name": name,
         "premium_user": False,
         "chat_history": [],
-        "documents": [],
+        "transcript": Transcript(),
+        "documents": SessionDocumentStore(label=name),
+        "ingestion_jobs": {},
+        "ingestion_notices": [],
+        "retrieval_index": None,
+        "vector_index": None,
         "file_uploaded": False,
         "upload_message_shown": False,
         "user_query": "",
@@ -186,125 +212,26 @@ else:
     for key, default_value in required_session_keys.items():
         if key not in st.session_state:
             st.session_state[key] = default_value
+
+    # The indexes keep chunk offsets only and read chunk text from the session's compressed documents
+    if st.session_state.retrieval_index is None:
+        st.session_state.retrieval_index = BM25Index(st.session_state.documents)
+    if st.session_state.vector_index is None:
+        st.session_state.vector_index = VectorIndex(get_vector_store(), st.session_state.documents)
+
+    # Every few minutes, log how much document memory each live session holds
+    log_session_usage()
  
-    logo_path = "static/watermark.png"
- 
-    with open(logo_path, "rb") as image_file:
-        encoded_logo = base64.b64encode(image_file.read()).decode()
- 
+    # Theme is inlined from static/ (read once per process); the watermark is served from static/
     st.markdown(
         f'''
-        <style>
-            .stApp {{
-                background: url("data:image/png;base64,{encoded_logo}") no-repeat center center fixed;
-                background-size: cover;
-                opacity: 1; /* Adjust transparency here, closer to 1 is more opaque */
-            }}
-            .p {{
-                position: absolute;
-                top: 60;
-                left: 0;
-                width: 100%;
-                background-color: rgba(255, 255, 255, 0.8); /* Optional background for readability */
-                text-align: center;
-                padding: 10px 0;
-                z-index: 1000;
-            }}
-        </style>
+        {stylesheet_tag(APP_DIR, "theme.css")}
         <div class="header">
             <p style='font-size:50px;color:#000000;margin:0;'>🤖-What can I help you with?</p>
         </div>
         ''',
         unsafe_allow_html=True,
     )
-   
-    st.markdown(
-        """
-        <style>
-            body {
-                background-color: #337EFF;
-                color: white;
-                background-size: cover;
-            }
-            .chat-container {
-                max-width: 600px;
-                margin: auto;
-            }
-            .chat-bubble {
-                padding: 10px;
-                border-radius: 10px;
-                margin-bottom: 10px;
-                display: inline-block;
-                max-width: 70%;
-                color: white;
-            }
-            .user {
-                background-color: #337EFF;
-                text-align: left;
-                float: right;
-                clear: both;
-                margin-right: 10px;
-            }
-            .ai {
-                background-color: #337EFF;
-                text-align: left;
-                float: left;
-                clear: both;
-                margin-left: 10px;
-            }
-            @media (max-width: 900px) {
-                .chat-container { margin: 0 10px; }
-            }
-            div.stButton > button {
-                background-color: #337EFF !important;
-                color: white !important;
-                border-radius: 10px !important;
-                padding: 7px 20px !important;
-                font-size: 16px !important;
-                border: none !important;
-                margin-top: 27px;
-            }
-            div.stButton > button:hover {
-                background-color: #004ED4 !important;
-            }
-            div.stForm button {
-                background-color: #337EFF !important;
-                color: white !important;
-                border-radius: 70px !important;
-                padding: 17px 25px !important;
-                font-size: 16px !important;
-                font-weight: bold !important;
-                font-style: italic !important;
-                border: none !important;
-                position: fixed !important;
-                bottom: 15px;
-                justify-content: center;
-                z-index: 1000;
-                cursor: pointer;
-            }
-            div.stForm button:hover {
-                background-color: #004ED4 !important;
-            }
-            .stTextInput {
-                height:px;
-                padding: 10px 20px !important;
-                width: 550px !important;
-                position: fixed !important;
-                bottom: 15px;
-                border-radius: 50px !important;
-                font-size: 16px !important;
-                background-color: #337EFF;
-                z-index: 1000;
-            }
-            div.stForm {
-                border: none;
-                box-shadow: none;
-                padding: 0;
-            }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
  
     # If signed out, redirect immediately
     if st.session_state.get("signed_out", False):
@@ -317,7 +244,7 @@ else:
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     if "documents" not in st.session_state:
-        st.session_state.documents = []
+        st.session_state.documents = SessionDocumentStore(label=st.session_state.get("user_name"))
     if "file_uploaded" not in st.session_state:
         st.session_state.file_uploaded = False
     if "upload_message_shown" not in st.session_state:
@@ -358,11 +285,20 @@ else:
         uploaded_files = st.file_uploader(
             "Upload PDFs or DOCX files", type=["pdf", "docx"], accept_multiple_files=True, key="multi_upload"
         )
+        whole_document_mode = st.checkbox(
+            "📚 Read entire documents",
+            key="whole_document_mode",
+            help="Slower, but reads every page. Use it for summaries and questions about the whole document."
+        )
  
         if st.button("🗑️ Clear Chat History", key="clear_chat"):
             st.session_state.chat_history = []
             st.session_state.file_uploaded = False
-            st.session_state.documents = []
+            st.session_state.documents.clear()
+            st.session_state.ingestion_jobs = {}
+            st.session_state.ingestion_notices = []
+            st.session_state.retrieval_index = BM25Index(st.session_state.documents)
+            st.session_state.vector_index = VectorIndex(get_vector_store(), st.session_state.documents)
             st.session_state.upload_message_shown = False
             st.rerun()
  
@@ -422,10 +358,7 @@ else:
     st.write("")
  
     if st.session_state.chat_history:
-        for speaker, text in st.session_state.chat_history:
-            alignment = "user" if speaker == "You" else "ai"
-            icon = "🧑‍💻" if speaker == "You" else "🤖 AI:"
-            st.markdown(f"<div class='chat-bubble {alignment}'><strong>{icon}</strong> {text}</div>", unsafe_allow_html=True)
+        st.session_state.transcript.render(st.session_state.chat_history)
     else:
         st.write("")
  
@@ -437,24 +370,58 @@ else:
             _, ext = os.path.splitext(uploaded_file.name)
             file_type = ext.lstrip(".").lower()
  
-            # Avoid re-uploading same file
-            if not any(doc[0] == file_name for doc in st.session_state.documents):
-                with st.spinner(f"Uploading {file_name}..."):
-                    s3_client.upload_fileobj(uploaded_file, S3_BUCKET, file_name)
- 
-                with st.spinner(f"Extracting text from {file_name}..."):
-                    document_text = extract_text(file_name, file_type, s3_bucket=S3_BUCKET)
- 
-                if not document_text.strip():
-                    st.error(f"{file_name} contains no text. Skipping...")
-                else:
-                    st.session_state.documents.append((file_name, document_text))
-                    st.session_state.file_uploaded = True
- 
-        if not st.session_state.upload_message_shown and st.session_state.documents:
-            st.session_state.chat_history.append(("AI", f"{len(st.session_state.documents)} files uploaded successfully! Ask your question below."))
-            st.session_state.upload_message_shown = True
+            # Avoid re-uploading same file (or one that is still being extracted)
+            already_loaded = file_name in st.session_state.documents
+            if not already_loaded and file_name not in st.session_state.ingestion_jobs:
+                # Parse straight from the upload buffer; S3 only keeps an archive copy
+                file_bytes = uploaded_file.getvalue()
+                archive_to_s3(file_bytes, file_name)
+                st.session_state.ingestion_jobs[file_name] = submit_ingestion(file_name, file_type, file_bytes)
+
+    # Extract all new files concurrently; each document becomes queryable as soon as it is ready.
+    # Progress is polled in a fragment, so the rest of the page (including the chat input) renders right away.
+    @st.fragment(run_every=INGESTION_POLL_SECONDS)
+    def ingestion_progress():
+        ingestion_jobs = st.session_state.ingestion_jobs
+        finished = False
+        for job_name, job in list(ingestion_jobs.items()):
+            if not job.done():
+                st.progress(job.progress(), text=job.status_text())
+                continue
+
+            document_text = job.result()
+            del ingestion_jobs[job_name]
+            finished = True
+            if not document_text.strip():
+                st.session_state.ingestion_notices.append(("error", f"{job_name} contains no text. Skipping..."))
+            elif is_extraction_error(document_text):
+                st.session_state.ingestion_notices.append(("error", f"{job_name}: {document_text}"))
+            else:
+                if getattr(document_text, "ocr_failed", False):
+                    st.session_state.ingestion_notices.append(("warning", f"{job_name}: OCR failed, so text from its scanned pages is missing."))
+                st.session_state.documents.append((job_name, document_text))
+                usage = st.session_state.documents.usage()
+                print(f"📦 Session {usage['session']}: {usage['documents']} documents, {usage['memory_bytes']} bytes in memory, {usage['disk_bytes']} bytes spilled")
+                st.session_state.retrieval_index.add_document(job_name, document_text)
+                try:
+                    st.session_state.vector_index.add_document(job_name, document_text)
+                except Exception as e:
+                    print(f"⚠️ Could not add {job_name} to the vector index: {e}")
+                st.session_state.file_uploaded = True
+
+        # Rerun the whole page when a document lands so it shows up (polling stops once no jobs are left)
+        if finished:
             st.rerun()
+
+    for notice_kind, notice in st.session_state.ingestion_notices:
+        getattr(st, notice_kind)(notice)
+    if st.session_state.ingestion_jobs:
+        ingestion_progress()
+
+    if uploaded_files and not st.session_state.upload_message_shown and st.session_state.documents:
+        st.session_state.chat_history.append(("AI", f"{len(st.session_state.documents)} files uploaded successfully! Ask your question below."))
+        st.session_state.upload_message_shown = True
+        st.rerun()
  
     # Ensure unique form key on every render
     if "chat_count" not in st.session_state:
@@ -487,16 +454,31 @@ else:
         send_button = True
         st.session_state.enter_pressed = False
  
+    STREAM_FRAME_INTERVAL = 0.05  # Redraw a streaming answer at most 20 times per second
+
+    def render_bubble(placeholder, text, role="AI"):
+        placeholder.markdown(bubble_html(role, text), unsafe_allow_html=True)
+
     def display_animated_text(text, role="AI"):
+        render_bubble(st.empty(), text, role)
+
+    def display_streamed_text(chunks, role="AI"):
+        """Render streamed text as it arrives, redrawing at most once per frame. Returns the full text."""
         placeholder = st.empty()
-        animated_text = ""
-       
-        for char in text:
-            animated_text += char
-            placeholder.markdown(f"<div class='chat-bubble {role.lower()}'><strong>🤖 AI:</strong> {animated_text}</div>", unsafe_allow_html=True)
-            time.sleep(0.02)  
+        parts = []
+        last_frame = 0.0
+
+        for chunk in chunks:
+            parts.append(chunk)
+            now = time.monotonic()
+            if now - last_frame >= STREAM_FRAME_INTERVAL:
+                render_bubble(placeholder, "".join(parts) + "▌", role)
+                last_frame = now
+
+        text = "".join(parts)
+        render_bubble(placeholder, text, role)
+        return text
  
-    MAX_TOKENS = 42000  
  
  
     if st.session_state.get("premium_user", False):
@@ -521,7 +503,7 @@ else:
         elif not st.session_state.file_uploaded or not st.session_state.documents:
             # Show user's question immediately
             st.session_state.chat_history.append(("You", text_input))
-            st.markdown(f"<div class='chat-bubble user'><strong>🧑‍💻 You:</strong> {text_input}</div>", unsafe_allow_html=True)
+            st.markdown(bubble_html("You", text_input), unsafe_allow_html=True)
  
             # AI response for missing documents
             st.session_state.chat_history.append(("AI", "Hey, please upload one or more documents to start querying."))
@@ -531,28 +513,58 @@ else:
             st.rerun()
        
         else:
-            # Select a random document
-            selected_doc = random.choice(st.session_state.documents)
-            document_text = selected_doc[1]
- 
-            if len(document_text) > MAX_TOKENS:
-                warning_message = f"⚠️ The document **{selected_doc[0]}** is too large to process (limit: {MAX_TOKENS} characters). Try a smaller document or summarizing it."
-                st.session_state.chat_history.append(("AI", warning_message))
-                display_animated_text(warning_message, role="AI")  
-            else:
-                try:
-                    answer = query_bedrock(document_text, text_input)
- 
-                    st.session_state.chat_history.append(("You", text_input))
-                    st.markdown(f"<div class='chat-bubble user'><strong>🧑‍💻 You:</strong> {text_input}</div>", unsafe_allow_html=True)
- 
-                    st.session_state.chat_history.append(("AI", answer))
+            st.session_state.chat_history.append(("You", text_input))
+            st.markdown(bubble_html("You", text_input), unsafe_allow_html=True)
+
+            # Same question about the same documents: reuse the earlier answer
+            answer_mode = "map_reduce" if whole_document_mode else "retrieval"
+            answer_cache = get_answer_cache()
+            cache_key = answer_cache.make_key(digests_hash(st.session_state.documents.digests()), text_input, model_id, {**generation_config, "mode": answer_mode})
+            cached_answer = answer_cache.get(cache_key)
+
+            try:
+                if cached_answer is not None:
+                    answer = cached_answer
                     display_animated_text(answer, role="AI")
- 
-                except Exception as e:
-                    error_message = f"❌ An error occurred: {str(e)}"
-                    st.session_state.chat_history.append(("AI", error_message))
-                    display_animated_text(error_message, role="AI")
+                elif whole_document_mode:
+                    # Read every part of every document concurrently, then combine the notes
+                    map_progress = st.progress(0.0, text="📚 Reading the documents...")
+
+                    def report_map_progress(done, total):
+                        map_progress.progress(done / total, text=f"📚 Read {done} of {total} parts...")
+
+                    chunks = map_reduce_stream(st.session_state.documents, text_input, progress_callback=report_map_progress)
+                    map_progress.empty()
+                    answer = display_streamed_text(chunks, role="AI")
+                    if answer.strip():
+                        answer_cache.put(cache_key, answer)
+                else:
+                    # Answer from the most relevant chunks across all uploaded documents
+                    retrieval_index = st.session_state.retrieval_index
+                    retrieval_index.sync(st.session_state.documents.items(skip=retrieval_index.doc_names))
+                    keyword_results = retrieval_index.search(text_input, top_k=RETRIEVAL_TOP_K)
+
+                    try:
+                        vector_index = st.session_state.vector_index
+                        vector_index.sync(st.session_state.documents.items(skip=vector_index.doc_names))
+                        semantic_results = vector_index.search(text_input, top_k=RETRIEVAL_TOP_K)
+                    except Exception as e:
+                        print(f"⚠️ Semantic search unavailable, using keyword results only: {e}")
+                        semantic_results = []
+
+                    # Rank extra candidates and let the prompt budget decide how many fit
+                    results = fuse_results([keyword_results, semantic_results], top_k=2 * RETRIEVAL_TOP_K)
+                    prompt = build_context_prompt(results, text_input)
+
+                    answer = display_streamed_text(stream_prompt(prompt), role="AI")
+                    if answer.strip():
+                        answer_cache.put(cache_key, answer)
+                st.session_state.chat_history.append(("AI", answer))
+ 
+            except Exception as e:
+                error_message = f"❌ An error occurred: {str(e)}"
+                st.session_state.chat_history.append(("AI", error_message))
+                display_animated_text(error_message, role="AI")
  
             st.session_state.reset_input = True
             st.session_state["chat_count"] += 1
@@ -1,41 +1,189 @@
-import boto3
-import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from common.bedrock_gateway import get_bedrock_gateway
+from common.prompt_budget import PromptBudgeter, PromptSection
+from retrieval import chunk_text
 
-aws_region = "ap-south-1"
-bedrock_client = boto3.client("bedrock-runtime", region_name=aws_region)
+model_id = "amazon.titan-text-express-v1"  # ✅ Correct Model ID for Titan Text
 
-def query_bedrock(document_text, user_query):
-    model_id = "amazon.titan-text-express-v1"  # ✅ Correct Model ID for Titan Text
-    
-    # Titan requires "inputText" instead of "prompt"
-    full_prompt = f"""Here is some context for you:
-{document_text}
+# ✅ Required for token control (also part of the answer cache key)
+generation_config = {
+    "maxTokenCount": 500,
+    "stopSequences": [],
+    "temperature": 0.7,
+    "topP": 0.9
+}
+
+# Fits every prompt into the model's context window, leaving room for the answer
+prompt_budgeter = PromptBudgeter(model_id, max_output_tokens=generation_config["maxTokenCount"])
+
+# Map-reduce answering over whole documents (override through the environment)
+MAP_REDUCE_CHUNK_TOKENS = int(os.getenv("MAP_REDUCE_CHUNK_TOKENS", "0"))   # Document tokens per map call, 0 = as many as fit
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "8"))     # Map calls in flight across the process
+NO_ANSWER = "NONE"
+
+ANSWER_TEMPLATE = """Here is some context for you:
+{context}
 
 Now, answer this question:
-{user_query}
+{question}
 """
 
-    payload = {
+MAP_TEMPLATE = """Here is part %(part)d of %(parts)d of the document "%(doc_name)s":
+{context}
+
+Write down everything in this part that helps answer the question below, including names, numbers and section titles.
+If nothing in this part is relevant, reply with only """ + NO_ANSWER + """.
+
+Question:
+{question}
+"""
+
+REDUCE_TEMPLATE = """Here are notes taken from different parts of the uploaded documents:
+{context}
+
+Using only these notes, answer this question:
+{question}
+"""
+
+def build_prompt_payload(full_prompt):
+    """Titan request body for a complete prompt."""
+    return {
         "inputText": full_prompt,   # ✅ Titan expects "inputText", NOT "prompt"
-        "textGenerationConfig": {   # ✅ Required for token control
-            "maxTokenCount": 500,
-            "stopSequences": [],
-            "temperature": 0.7,
-            "topP": 0.9
-        }
+        "textGenerationConfig": generation_config
     }
 
-    response = bedrock_client.invoke_model(
-        modelId=model_id,
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps(payload)
-    )
+def build_payload(document_text, user_query):
+    """Titan request body for a question about the given context, trimmed to the model's window."""
+    # Titan requires "inputText" instead of "prompt"
+    prompt = prompt_budgeter.build(ANSWER_TEMPLATE, user_query, [PromptSection(document_text, name="document")])
+    return build_prompt_payload(prompt.text)
+
+def build_context_prompt(results, user_query):
+    """Prompt for a question over ranked retrieval results, packing the best chunks that fit."""
+    sections = [
+        PromptSection(
+            f"[Source: {result.doc_name}]\n{result.text}",
+            priority=rank,
+            order=(result.doc_name, result.position),
+            name=f"{result.doc_name}#{result.position}",
+        )
+        for rank, result in enumerate(results)
+    ]
+    return prompt_budgeter.build(ANSWER_TEMPLATE, user_query, sections).text
 
-    result = json.loads(response["body"].read())
+def invoke_prompt(full_prompt):
+    result = get_bedrock_gateway().invoke(model_id, build_prompt_payload(full_prompt))
     return result.get("results", [{}])[0].get("outputText", "Error: No response from model.")
 
-# Example test call
-response = query_bedrock("This is a test document.", "What is this document about?")
-print(response)
+def stream_prompt(full_prompt):
+    """Yield the completion of a prompt piece by piece as Bedrock generates it."""
+    for chunk in get_bedrock_gateway().stream(model_id, build_prompt_payload(full_prompt)):
+        text = chunk.get("outputText", "")
+        if text:
+            yield text
+
+def query_bedrock(document_text, user_query):
+    return invoke_prompt(build_payload(document_text, user_query)["inputText"])
+
+def query_bedrock_stream(document_text, user_query):
+    """Yield the answer text piece by piece as Bedrock generates it."""
+    return stream_prompt(build_payload(document_text, user_query)["inputText"])
+
+
+_map_pool = None
+_map_pool_lock = threading.Lock()
+
+def get_map_pool():
+    """Thread pool shared by every map-reduce answer, capping concurrent Bedrock calls."""
+    global _map_pool
+    with _map_pool_lock:
+        if _map_pool is None:
+            _map_pool = ThreadPoolExecutor(max_workers=MAP_REDUCE_CONCURRENCY, thread_name_prefix="map-reduce")
+        return _map_pool
+
+def build_map_prompt(doc_name, part, parts, chunk, user_query):
+    template = MAP_TEMPLATE % {"part": part, "parts": parts, "doc_name": doc_name}
+    return prompt_budgeter.build(template, user_query, [PromptSection(chunk, name=f"{doc_name} part {part}")]).text
+
+def build_reduce_prompt(notes, user_query):
+    return prompt_budgeter.build(REDUCE_TEMPLATE, user_query, [PromptSection(notes, name="notes")]).text
+
+def _split_to_budget(text, max_tokens):
+    """
+    Split text into parts of at most `max_tokens` estimated tokens, without cutting anything off.
+
+    Parts start at `max_tokens * chars_per_token` characters; dense text
+    (numbers, tables) runs well under that ratio, so a part still over
+    budget is split again in proportion to its estimated tokens.
+    """
+    parts = []
+    pending = chunk_text(text, chunk_size=max(100, int(max_tokens * prompt_budgeter.chars_per_token)), overlap=0)
+    while pending:
+        part = pending.pop(0)
+        tokens = prompt_budgeter.count(part)
+        if tokens <= max_tokens or len(part) <= 100:
+            parts.append(part)
+        else:
+            pending[0:0] = chunk_text(part, chunk_size=max(50, int(len(part) * max_tokens / tokens * 0.9)), overlap=0)
+    return parts
+
+def _batch_notes(notes, max_tokens):
+    """Group notes into joined batches of at most `max_tokens` estimated tokens."""
+    batches, current, size = [], [], 0
+    for note in notes:
+        tokens = prompt_budgeter.count(note)
+        if current and size + tokens > max_tokens:
+            batches.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(note)
+        size += tokens
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+def _run_concurrently(prompts, progress_callback=None):
+    """Invoke every prompt on the shared map pool and return the completions in input order."""
+    results = [None] * len(prompts)
+    futures = {get_map_pool().submit(invoke_prompt, prompt): i for i, prompt in enumerate(prompts)}
+    for done, future in enumerate(as_completed(futures), start=1):
+        results[futures[future]] = future.result()
+        if progress_callback:
+            progress_callback(done, len(prompts))
+    return results
+
+def map_reduce_stream(documents, user_query, chunk_tokens=MAP_REDUCE_CHUNK_TOKENS, progress_callback=None):
+    """
+    Answer a question over whole (name, text) documents of any size.
+
+    Every document is split into prompt-sized parts and each part is asked
+    for its relevant facts concurrently on the shared map pool. The notes
+    are then combined in a final call whose answer is streamed. If the notes
+    themselves overflow one prompt they are condensed in further concurrent
+    rounds first. `progress_callback(done, total)` reports map calls.
+    """
+    map_prompts = []
+    for doc_name, text in documents:
+        # Budget with this document's name and generous part numbers filled in, so no part gets truncated
+        template = MAP_TEMPLATE % {"part": 99999, "parts": 99999, "doc_name": doc_name}
+        budget = prompt_budgeter.context_budget(template, user_query)
+        chunks = _split_to_budget(text, min(chunk_tokens, budget) if chunk_tokens else budget)
+        for part, chunk in enumerate(chunks, start=1):
+            map_prompts.append(build_map_prompt(doc_name, part, len(chunks), chunk, user_query))
+
+    partials = _run_concurrently(map_prompts, progress_callback)
+    notes = [note.strip() for note in partials if note.strip().strip(".").upper() not in ("", NO_ANSWER)]
+    if not notes:
+        notes = ["The documents do not contain information relevant to this question."]
+
+    reduce_tokens = prompt_budgeter.context_budget(REDUCE_TEMPLATE, user_query)
+    batches = _batch_notes(notes, reduce_tokens)
+    while len(batches) > 1:
+        notes = _run_concurrently([build_reduce_prompt(batch, user_query) for batch in batches])
+        condensed = _batch_notes(notes, reduce_tokens)
+        if len(condensed) >= len(batches):
+            condensed = ["\n\n".join(notes)]  # Stop condensing once it no longer shrinks
+        batches = condensed
 
+    return stream_prompt(build_reduce_prompt(batches[0], user_query))
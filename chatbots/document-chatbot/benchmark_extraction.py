@@ -0,0 +1,219 @@
+"""
+Extraction throughput benchmark for the document chatbot.
+
+Generates a synthetic corpus (text PDFs, scanned image-only PDFs, mixed
+PDFs and DOCX files of the requested page counts), runs
+extract_text_from_pdf / extract_text_from_docx over it and prints a JSON
+report with pages/sec, peak RSS and per-stage timings:
+
+    python benchmark_extraction.py --pages 10 100 --repeat 3 --output before.json
+    OCR_BACKEND=poppler python benchmark_extraction.py --kinds scanned --output poppler.json
+
+Each case runs in a fresh subprocess so peak RSS is measured per case,
+including the OCR pool's worker processes.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import contextlib
+
+KINDS = ["text", "scanned", "mixed", "docx"]
+WORDS_PER_PAGE = 350
+PARAGRAPHS_PER_DOCX_PAGE = 8
+SCAN_DPI = 150
+
+VOCABULARY = (
+    "invoice policy customer contract payment delivery schedule warranty clause section "
+    "report quarter revenue margin forecast supplier order shipment account balance "
+    "the of and to in for with on by from at as is are was be this that which"
+).split()
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(count))
+
+
+def _page_text(rng, page_no):
+    return f"Page {page_no + 1}\n\n" + "\n\n".join(_words(rng, WORDS_PER_PAGE // 5) for _ in range(5))
+
+
+def generate_pdf(path, pages, kind, seed=0):
+    """Write a PDF whose pages are searchable text, image-only scans, or alternating ("mixed")."""
+    import fitz
+
+    rng = random.Random(seed)
+    with fitz.open() as doc:
+        for page_no in range(pages):
+            scanned = kind == "scanned" or (kind == "mixed" and page_no % 2 == 1)
+            text = _page_text(rng, page_no)
+            if not scanned:
+                page = doc.new_page()
+                page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=10)
+                continue
+
+            # Typeset the page on a scratch document, then keep only its rendered image
+            with fitz.open() as scratch:
+                source = scratch.new_page()
+                source.insert_textbox(source.rect + (50, 50, -50, -50), text, fontsize=10)
+                pix = source.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY, alpha=False)
+            page = doc.new_page()
+            page.insert_image(page.rect, pixmap=pix)
+        doc.save(path, garbage=3, deflate=True)
+
+
+def generate_docx(path, pages, seed=0):
+    """Write a DOCX with paragraphs and a small table on each page."""
+    import docx
+    from docx.enum.text import WD_BREAK
+
+    rng = random.Random(seed)
+    document = docx.Document()
+    for page_no in range(pages):
+        document.add_heading(f"Section {page_no + 1}", level=2)
+        for _ in range(PARAGRAPHS_PER_DOCX_PAGE):
+            document.add_paragraph(_words(rng, WORDS_PER_PAGE // PARAGRAPHS_PER_DOCX_PAGE))
+        table = document.add_table(rows=4, cols=3)
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = _words(rng, 3)
+        document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    document.save(path)
+
+
+def generate_corpus(corpus_dir, kinds, page_counts):
+    """Create (kind, pages, path) cases, reusing files from an earlier run."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    cases = []
+    for kind in kinds:
+        for pages in page_counts:
+            extension = "docx" if kind == "docx" else "pdf"
+            path = os.path.join(corpus_dir, f"{kind}-{pages}p.{extension}")
+            if not os.path.exists(path):
+                print(f"🛠️ Generating {path}", file=sys.stderr)
+                if kind == "docx":
+                    generate_docx(path, pages)
+                else:
+                    generate_pdf(path, pages, kind)
+            cases.append((kind, pages, path))
+    return cases
+
+
+def _peak_rss_mb(who):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(kind, pages, path, repeat):
+    """Extract one file `repeat` times in this process and return its report."""
+    from extract_text import extract_text_from_pdf, extract_text_from_docx, collect_stage_timings, is_extraction_error
+    import extract_text
+
+    runs = []
+    chars = 0
+    error = None
+    for _ in range(repeat):
+        with collect_stage_timings() as stages:
+            start = time.perf_counter()
+            if kind == "docx":
+                text = extract_text_from_docx(path)
+            else:
+                text = extract_text_from_pdf(path)
+            seconds = time.perf_counter() - start
+        if is_extraction_error(text):
+            error = text
+        chars = len(text)
+        runs.append({
+            "seconds": round(seconds, 4),
+            "pages_per_sec": round(pages / seconds, 2) if seconds else None,
+            "stages": {name: round(value, 4) for name, value in sorted(stages.items())},
+        })
+
+    # Let the OCR pool's workers exit so their memory shows up in RUSAGE_CHILDREN
+    for pool in extract_text._ocr_pools.values():
+        pool.shutdown(wait=True)
+
+    median_seconds = round(statistics.median(run["seconds"] for run in runs), 4)
+    return {
+        "kind": kind,
+        "pages": pages,
+        "file_bytes": os.path.getsize(path),
+        "chars": chars,
+        "error": error,
+        "median_seconds": median_seconds,
+        "pages_per_sec": round(pages / median_seconds, 2) if median_seconds else None,
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "children_peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document text extraction.")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 50])
+    parser.add_argument("--repeat", type=int, default=3, help="extractions per file (the median is reported)")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "extraction-benchmark-corpus"))
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--run-case", nargs=4, metavar=("KIND", "PAGES", "PATH", "RESULT_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        kind, pages, path, result_file = args.run_case
+        result = run_case(kind, int(pages), path, args.repeat)
+        with open(result_file, "w") as f:
+            json.dump(result, f)
+        return
+
+    # Import-time library chatter goes to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        from extract_text import EXTRACTOR_VERSION, OCR_WORKERS
+        from ocr_backends import DEFAULT_OCR_BACKEND
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "extractor_version": EXTRACTOR_VERSION,
+        "ocr_backend": DEFAULT_OCR_BACKEND,
+        "ocr_workers": OCR_WORKERS,
+        "repeat": args.repeat,
+        "results": [],
+    }
+
+    script = os.path.abspath(__file__)
+    for kind, pages, path in generate_corpus(args.corpus_dir, args.kinds, args.pages):
+        print(f"⏱️ {kind} {pages} pages", file=sys.stderr)
+        fd, result_file = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            # Extraction logs go to stderr so stdout stays valid JSON
+            subprocess.run(
+                [sys.executable, script, "--repeat", str(args.repeat), "--run-case", kind, str(pages), path, result_file],
+                check=True, stdout=sys.stderr, cwd=os.path.dirname(script),
+            )
+            with open(result_file) as f:
+                report["results"].append(json.load(f))
+        except subprocess.CalledProcessError as e:
+            report["results"].append({"kind": kind, "pages": pages, "error": f"benchmark run failed: {e}"})
+        finally:
+            os.remove(result_file)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
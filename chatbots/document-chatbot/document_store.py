@@ -0,0 +1,186 @@
+import os
+import zlib
+import uuid
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import weakref
+
+# zstandard compresses faster and smaller; without it we fall back to zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Session document settings (override through the environment)
+SESSION_DOCUMENT_QUOTA_MB = float(os.getenv("SESSION_DOCUMENT_QUOTA_MB", "16"))   # Compressed bytes kept in memory per session
+DOCUMENT_SPILL_DIR = os.getenv("DOCUMENT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "document-chatbot-spill"))
+SESSION_USAGE_LOG_SECONDS = int(os.getenv("SESSION_USAGE_LOG_SECONDS", "300"))   # How often the per-session summary is logged
+
+# Every live store, so operators can see per-session usage
+_stores = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+_usage_logged_at = 0.0
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class StoredDocument:
+    """One document's compressed text, held in memory or spilled to a file."""
+
+    def __init__(self, name, digest, text_bytes, codec, data):
+        self.name = name
+        self.digest = digest            # SHA-256 of the UTF-8 text
+        self.text_bytes = text_bytes    # Uncompressed size
+        self.codec = codec
+        self.data = data                # Compressed text, or None once spilled
+        self.path = None                # Spill file, once spilled
+        self.compressed_bytes = len(data)
+        self.last_used = time.monotonic()
+
+
+class SessionDocumentStore:
+    """
+    The uploaded documents of one session, kept compressed.
+
+    Behaves like the list of (name, text) tuples it replaces: `append`,
+    `len`, truthiness and iteration all work, with text decompressed only
+    when it is read. Compressed text stays in memory up to `quota_bytes`;
+    beyond that the least recently used documents spill to files under
+    `spill_dir` and are read back on demand. Spill files are removed when
+    the store is cleared or garbage collected with its session.
+    """
+
+    def __init__(self, label=None, quota_bytes=int(SESSION_DOCUMENT_QUOTA_MB * 1024 * 1024), spill_dir=DOCUMENT_SPILL_DIR):
+        self.session_id = uuid.uuid4().hex
+        self.label = label or self.session_id[:8]
+        self.quota_bytes = quota_bytes
+        self.spill_dir = os.path.join(spill_dir, self.session_id)
+        self._documents = []
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        with _stores_lock:
+            _stores[self.session_id] = self
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __bool__(self):
+        return bool(self._documents)
+
+    def __iter__(self):
+        return self.items()
+
+    def __contains__(self, name):
+        return any(document.name == name for document in self._documents)
+
+    def names(self):
+        return [document.name for document in self._documents]
+
+    def digests(self):
+        """SHA-256 of each document's text, without decompressing anything."""
+        return [document.digest for document in self._documents]
+
+    def append(self, document):
+        """Add a (name, text) document."""
+        name, text = document
+        raw = text.encode("utf-8")
+        codec, data = _compress(raw)
+        stored = StoredDocument(name, hashlib.sha256(raw).hexdigest(), len(raw), codec, data)
+        with self._lock:
+            self._documents.append(stored)
+            self._enforce_quota()
+
+    def items(self, skip=()):
+        """Yield (name, text) for every document whose name is not in `skip`."""
+        for document in list(self._documents):
+            if document.name not in skip:
+                yield document.name, self._read(document)
+
+    def get(self, name):
+        """Text of the named document, or None."""
+        for document in self._documents:
+            if document.name == name:
+                return self._read(document)
+        return None
+
+    def clear(self):
+        """Forget every document and delete this session's spill files."""
+        with self._lock:
+            self._documents = []
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _read(self, document):
+        document.last_used = time.monotonic()
+        data = document.data
+        if data is None:
+            with open(document.path, "rb") as f:
+                data = f.read()
+        return _decompress(document.codec, data).decode("utf-8")
+
+    def _enforce_quota(self):
+        """Spill least recently used documents until the in-memory bytes fit the quota."""
+        in_memory = [document for document in self._documents if document.data is not None]
+        held = sum(document.compressed_bytes for document in in_memory)
+        for document in sorted(in_memory, key=lambda document: document.last_used):
+            if held <= self.quota_bytes:
+                break
+            try:
+                self._spill(document)
+            except OSError as e:
+                print(f"⚠️ Could not spill {document.name} to disk, keeping it in memory: {e}")
+                break
+            held -= document.compressed_bytes
+
+    def _spill(self, document):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{document.digest}.{document.codec}")
+        with open(path, "wb") as f:
+            f.write(document.data)
+        document.path = path
+        document.data = None
+
+    def usage(self):
+        """Bytes held by this session: text size, compressed in memory and spilled to disk."""
+        documents = list(self._documents)
+        return {
+            "session": self.label,
+            "documents": len(documents),
+            "text_bytes": sum(document.text_bytes for document in documents),
+            "memory_bytes": sum(document.compressed_bytes for document in documents if document.data is not None),
+            "disk_bytes": sum(document.compressed_bytes for document in documents if document.data is None),
+        }
+
+
+def session_usage():
+    """Per-session usage of every live document store, largest in-memory first."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    return sorted((store.usage() for store in stores), key=lambda usage: usage["memory_bytes"], reverse=True)
+
+
+def log_session_usage(interval=SESSION_USAGE_LOG_SECONDS):
+    """Print every live session's usage, at most once per `interval` seconds per process."""
+    global _usage_logged_at
+    with _stores_lock:
+        if time.monotonic() - _usage_logged_at < interval:
+            return
+        _usage_logged_at = time.monotonic()
+    usages = session_usage()
+    total_memory = sum(usage["memory_bytes"] for usage in usages)
+    total_disk = sum(usage["disk_bytes"] for usage in usages)
+    print(f"📦 {len(usages)} sessions hold {total_memory} bytes of documents in memory and {total_disk} bytes spilled")
+    for usage in usages:
+        print(f"📦   Session {usage['session']}: {usage['documents']} documents, {usage['memory_bytes']} bytes in memory, {usage['disk_bytes']} bytes spilled")
@@ -0,0 +1,93 @@
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCUMENT_PART = "word/document.xml"
+CELL_SEPARATOR = " | "
+
+# Run-level elements that stand for whitespace (w:tab also defines tab stops under w:pPr, outside any run)
+BREAKS = {W + "tab": "\t", W + "br": "\n", W + "cr": "\n"}
+
+
+def iter_docx_blocks(source):
+    """
+    Yield the text of each paragraph and table row of a DOCX, in document order.
+
+    `word/document.xml` is parsed incrementally straight from the zip, so
+    memory stays flat however large the document is. Table rows come out as
+    one line with cells joined by CELL_SEPARATOR; nested tables and text
+    boxes are folded into the cell or paragraph that contains them.
+    """
+    with zipfile.ZipFile(source) as archive, archive.open(DOCUMENT_PART) as xml_file:
+        paragraphs = []  # Run text of each open paragraph (text boxes nest inside paragraphs)
+        cells = []       # Paragraph text of each open table cell
+        rows = []        # Cell text of each open table row
+        tables = []      # Open table elements, outermost first
+        run_depth = 0    # Open w:r runs; breaks only count inside one...
+        ppr_depth = 0    # ...and outside paragraph properties (text boxes put whole paragraphs inside a run)
+        body = None
+
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == W + "r":
+                    run_depth += 1
+                elif tag == W + "pPr":
+                    ppr_depth += 1
+                elif tag == W + "p":
+                    paragraphs.append([])
+                elif tag == W + "tc":
+                    cells.append([])
+                elif tag == W + "tr":
+                    rows.append([])
+                elif tag == W + "tbl":
+                    tables.append(elem)
+                elif tag == W + "body":
+                    body = elem
+                continue
+
+            if tag == W + "t":
+                if paragraphs and elem.text:
+                    paragraphs[-1].append(elem.text)
+            elif tag == W + "r":
+                run_depth -= 1
+                continue
+            elif tag == W + "pPr":
+                ppr_depth -= 1
+                continue
+            elif tag in BREAKS:
+                if paragraphs and run_depth and not ppr_depth:
+                    paragraphs[-1].append(BREAKS[tag])
+            elif tag == W + "p":
+                text = "".join(paragraphs.pop())
+                if paragraphs:
+                    paragraphs[-1].append(text)
+                elif cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == W + "tc":
+                rows[-1].append(" ".join(part for part in cells.pop() if part.strip()))
+            elif tag == W + "tr":
+                text = CELL_SEPARATOR.join(rows.pop())
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == W + "tbl":
+                tables.pop()
+                continue
+            else:
+                continue
+
+            # Drop finished top-level paragraphs and table rows so the parsed tree never grows
+            if not paragraphs and not cells:
+                if tables:
+                    tables[0].clear()
+                elif body is not None:
+                    body.clear()
+
+
+def extract_docx_text(source):
+    """Text of a DOCX (a path or a file-like object), one paragraph or table row per line."""
+    return "\n".join(iter_docx_blocks(source))
@@ -1,57 +1,327 @@
 import boto3
+import io
 import os
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import fitz  # Ensure PyMuPDF is properly imported
 import docx
-import pytesseract
-from pdf2image import convert_from_path
+from docx_stream import extract_docx_text
+from ocr_backends import get_ocr_backend, recognize_page, FALLBACK_OCR_BACKEND
+from extraction_cache import get_extraction_cache
 
 # Initialize S3 client
 s3_client = boto3.client("s3")
 
+# Bump whenever extraction output changes so cached results are not reused
+EXTRACTOR_VERSION = "6"
+
+# OCR pipeline settings (override through the environment)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MEMORY_LIMIT_MB = int(os.getenv("OCR_MEMORY_LIMIT_MB", "512"))
+
+# A page goes to OCR only when its text layer is this sparse...
+MIN_PAGE_TEXT_CHARS = int(os.getenv("MIN_PAGE_TEXT_CHARS", "25"))
+# ...and images cover at least this fraction of it
+MIN_PAGE_IMAGE_COVERAGE = float(os.getenv("MIN_PAGE_IMAGE_COVERAGE", "0.3"))
+
+class ExtractionResult(str):
+    """
+    Text returned by the extract_* functions; behaves as the text itself.
+
+    `error` is True when extraction failed and the string is the error
+    message. `ocr_failed` is True when OCR failed on a PDF that still had
+    some text, so the text is missing its scanned pages.
+    """
+
+    def __new__(cls, text, error=False, ocr_failed=False):
+        result = super().__new__(cls, text)
+        result.error = error
+        result.ocr_failed = ocr_failed
+        return result
+
+def _error(message):
+    return ExtractionResult(message, error=True)
+
+def _text_or_error(text):
+    return ExtractionResult(text.strip()) if text.strip() else _error("Error: No extractable text found.")
+
+# Per-thread stage timings, only collected while a benchmark asks for them
+_stage_timings = threading.local()
+
+@contextmanager
+def collect_stage_timings():
+    """Collect wall-clock seconds per extraction stage (open, text, render, ocr, docx) in the yielded dict."""
+    timings = {}
+    _stage_timings.current = timings
+    try:
+        yield timings
+    finally:
+        _stage_timings.current = None
+
+@contextmanager
+def timed_stage(name):
+    timings = getattr(_stage_timings, "current", None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+# Long-lived OCR process pools, keyed by worker count
+_ocr_pools = {}
+_ocr_pools_lock = threading.Lock()
+
+def get_ocr_pool(workers=None):
+    """Return the process pool used for OCR, creating it on first use."""
+    workers = max(1, workers or OCR_WORKERS)
+    with _ocr_pools_lock:
+        if workers not in _ocr_pools:
+            # Spawn instead of fork: the Streamlit server is multi-threaded
+            _ocr_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _ocr_pools[workers]
+
+def _discard_ocr_pool(workers=None, pool=None):
+    """
+    Drop a broken OCR pool so the next get_ocr_pool() builds a new one.
+
+    A pool whose worker died (e.g. OOM-killed) raises BrokenProcessPool on
+    every later submit. With `pool`, only that exact pool is dropped, so a
+    replacement another thread already built is kept.
+    """
+    workers = max(1, workers or OCR_WORKERS)
+    with _ocr_pools_lock:
+        cached = _ocr_pools.get(workers)
+        if cached is None or (pool is not None and cached is not pool):
+            return
+        del _ocr_pools[workers]
+    cached.shutdown(wait=False, cancel_futures=True)
+
+def _ocr_window_size(page, backend, memory_limit_mb):
+    """Number of rendered pages that fit under the memory ceiling at once."""
+    page_bytes = backend.estimate_page_bytes(page)
+    return max(1, int(memory_limit_mb * 1024 * 1024 // max(page_bytes, 1)))
+
+def _contiguous_runs(page_numbers):
+    """Split sorted page numbers into (first, last) ranges, last exclusive."""
+    runs = []
+    for page_no in page_numbers:
+        if runs and runs[-1][1] == page_no:
+            runs[-1][1] = page_no + 1
+        else:
+            runs.append([page_no, page_no + 1])
+    return [tuple(run) for run in runs]
+
+# Function to decide whether a single page needs OCR
+def page_needs_ocr(page, page_text):
+    """True when a page has no usable text layer and is mostly covered by images."""
+    if len("".join(page_text.split())) >= MIN_PAGE_TEXT_CHARS:
+        return False
+
+    page_area = page.rect.get_area()
+    if not page_area:
+        return False
+
+    image_area = 0
+    for info in page.get_image_info():
+        image_area += (fitz.Rect(info["bbox"]) & page.rect).get_area()
+    return image_area / page_area >= MIN_PAGE_IMAGE_COVERAGE
+
+# Function to OCR PDF pages in bounded windows across a process pool
+def ocr_pdf_pages(doc, source, pages=None, progress_callback=None, workers=None, memory_limit_mb=None, backend=None):
+    """
+    OCR the given pages of `doc` (all pages by default) and return {page_number: text}.
+
+    `source` is the PDF path or bytes, for backends that render outside PyMuPDF.
+    Only one window of rendered pages is held in memory at a time, sized so it
+    stays under `memory_limit_mb`. `progress_callback(done, total)` is called
+    after each page finishes.
+    """
+    backend = backend or get_ocr_backend()
+    pages = list(range(doc.page_count)) if pages is None else sorted(pages)
+    total = len(pages)
+    page_texts = {}
+    if total == 0:
+        return page_texts
+
+    window = _ocr_window_size(doc[pages[0]], backend, memory_limit_mb or OCR_MEMORY_LIMIT_MB)
+
+    for start in range(0, total, window):
+        window_pages = pages[start:start + window]
+        pool = get_ocr_pool(workers)
+        try:
+            window_texts = _ocr_window(pool, doc, source, window_pages, backend, len(page_texts), total, progress_callback)
+        except BrokenProcessPool as pool_error:
+            # A worker died mid-window: replace the pool and retry this window once
+            print(f"⚠️ OCR worker crashed ({pool_error}), restarting the OCR pool...")
+            _discard_ocr_pool(workers, pool)
+            pool = get_ocr_pool(workers)
+            try:
+                window_texts = _ocr_window(pool, doc, source, window_pages, backend, len(page_texts), total, progress_callback)
+            except BrokenProcessPool:
+                _discard_ocr_pool(workers, pool)
+                raise
+        page_texts.update(window_texts)
+
+    return page_texts
+
+def _ocr_window(pool, doc, source, window_pages, backend, done, total, progress_callback=None):
+    """OCR one window of pages on `pool` and return {page_number: text}."""
+    futures = {}
+    for first, last in _contiguous_runs(window_pages):
+        with timed_stage("render"):
+            rendered = backend.render(doc, source, first, last)
+        for offset, payload in enumerate(rendered):
+            futures[pool.submit(recognize_page, backend.name, payload)] = first + offset
+        del rendered  # The pool releases each page once its OCR completes
+
+    window_texts = {}
+    with timed_stage("ocr"):
+        for future in as_completed(futures):
+            window_texts[futures[future]] = future.result()
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+    return window_texts
+
+def _ocr_with_fallback(doc, source, pages, progress_callback=None):
+    """OCR with the configured backend, retrying on the poppler/pytesseract path if it fails."""
+    backend = get_ocr_backend()
+    try:
+        return ocr_pdf_pages(doc, source, pages=pages, progress_callback=progress_callback, backend=backend)
+    except Exception as backend_error:
+        if isinstance(backend_error, BrokenProcessPool):
+            # Workers kept dying; the fallback must not submit to the dead pool
+            _discard_ocr_pool()
+        fallback = get_ocr_backend(FALLBACK_OCR_BACKEND)
+        if backend.name == fallback.name:
+            raise
+        print(f"⚠️ OCR backend {backend.name} failed ({backend_error}), retrying with {fallback.name}...")
+        return ocr_pdf_pages(doc, source, pages=pages, progress_callback=progress_callback, backend=fallback)
+
+# Function to extract text from an opened PyMuPDF document (including OCR)
+def _extract_text_from_fitz_doc(doc, source, progress_callback=None):
+    """Extract text from an opened PDF. Pages without a usable text layer are OCRed."""
+    if doc.is_encrypted:
+        print("❌ Error: PDF is encrypted and cannot be processed.")
+        return _error("Error: PDF is encrypted.")
+
+    with timed_stage("text"):
+        page_texts = [page.get_text("text") for page in doc]
+        ocr_pages = [i for i, page in enumerate(doc) if page_needs_ocr(page, page_texts[i])]
+
+    # OCR only the scanned pages (all of them for a fully scanned PDF)
+    ocr_failed = False
+    if ocr_pages:
+        print(f"⚠️ {len(ocr_pages)} of {doc.page_count} pages have no text layer, attempting OCR...")
+        try:
+            ocr_texts = _ocr_with_fallback(doc, source, ocr_pages, progress_callback)
+            for page_no, page_text in ocr_texts.items():
+                page_texts[page_no] = page_text
+        except Exception as ocr_error:
+            print(f"❌ OCR Error: {ocr_error}")
+            if not "".join(page_texts).strip():
+                return _error("Error: OCR failed.")
+            # Keep the text layer of the other pages, but tell the caller the scanned pages are missing
+            print(f"⚠️ Returning text without {len(ocr_pages)} scanned pages")
+            ocr_failed = True
+
+    text = "\n".join(page_texts)
+    if not text.strip():
+        return _error("Error: No extractable text found.")
+    return ExtractionResult(text.strip(), ocr_failed=ocr_failed)
+
 # Function to extract text from a PDF file (including OCR)
-def extract_text_from_pdf(pdf_path):
+def extract_text_from_pdf(pdf_path, progress_callback=None):
     """Extract text from a PDF file. Uses OCR if no text is found."""
     try:
         if not os.path.exists(pdf_path):
             print("❌ Error: PDF file not found.")
-            return "Error: PDF file not found."
+            return _error("Error: PDF file not found.")
         
-        doc = fitz.open(pdf_path)  # Ensure this works correctly
-        if doc.is_encrypted:
-            print("❌ Error: PDF is encrypted and cannot be processed.")
-            return "Error: PDF is encrypted."
-        
-        text = "\n".join([page.get_text("text") for page in doc])
-        
-        # If no text is found, use OCR (for scanned PDFs)
-        if not text.strip():
-            print("⚠️ No text found in PDF, attempting OCR...")
-            try:
-                images = convert_from_path(pdf_path)
-                for img in images:
-                    text += pytesseract.image_to_string(img)
-            except Exception as ocr_error:
-                print(f"❌ OCR Error: {ocr_error}")
-                return "Error: OCR failed."
-        
-        return text.strip() if text.strip() else "Error: No extractable text found."
+        with timed_stage("open"):
+            doc = fitz.open(pdf_path)
+        with doc:
+            return _extract_text_from_fitz_doc(doc, pdf_path, progress_callback)
+    except Exception as e:
+        print(f"❌ Error extracting text from PDF: {e}")
+        return _error(f"Error extracting text from PDF: {e}")
+
+# Function to extract text from PDF bytes held in memory (including OCR)
+def extract_text_from_pdf_bytes(pdf_bytes, progress_callback=None):
+    """Extract text from an in-memory PDF. Uses OCR if no text is found."""
+    try:
+        with timed_stage("open"):
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        with doc:
+            return _extract_text_from_fitz_doc(doc, pdf_bytes, progress_callback)
     except Exception as e:
         print(f"❌ Error extracting text from PDF: {e}")
-        return f"Error extracting text from PDF: {e}"
+        return _error(f"Error extracting text from PDF: {e}")
 
 # Function to extract text from a DOCX file
 def extract_text_from_docx(docx_path):
-    """Extract text from a DOCX file."""
+    """Extract paragraph and table text from a DOCX file (a path or a file-like object)."""
     try:
-        doc = docx.Document(docx_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text.strip() if text.strip() else "Error: No extractable text found."
+        with timed_stage("docx"):
+            text = extract_docx_text(docx_path)
     except Exception as e:
-        print(f"❌ Error extracting DOCX text: {e}")
-        return f"Error extracting DOCX text: {e}"
+        # Fall back to python-docx for packages the streaming parser cannot read
+        print(f"⚠️ Streaming DOCX extraction failed, retrying with python-docx: {e}")
+        try:
+            if hasattr(docx_path, "seek"):
+                docx_path.seek(0)
+            doc = docx.Document(docx_path)
+            text = "\n".join([para.text for para in doc.paragraphs])
+        except Exception as e:
+            print(f"❌ Error extracting DOCX text: {e}")
+            return _error(f"Error extracting DOCX text: {e}")
+    return _text_or_error(text)
+
+# Function to tell extraction failures apart from extracted text
+def is_extraction_error(text):
+    """True for failed extractions (and empty text); document text that happens to start with "Error" is not one."""
+    return getattr(text, "error", False) or not text.strip()
+
+# Function to extract text straight from uploaded bytes (no S3 or disk round-trip)
+def extract_text_from_bytes(file_bytes, file_type, progress_callback=None):
+    """Extract text from the bytes of a PDF or DOCX file, reusing cached results for identical files."""
+    cache = get_extraction_cache()
+    cache_key = cache.make_key(file_bytes, file_type, EXTRACTOR_VERSION)
+    cached_text = cache.get(cache_key)
+    if cached_text is not None:
+        print(f"⚡ Extraction cache hit for {cache_key[:12]}")
+        return ExtractionResult(cached_text)
+
+    text = _extract_text_from_bytes_uncached(file_bytes, file_type, progress_callback)
+    # Text missing pages whose OCR failed is not cached, so the next upload retries the OCR
+    if not is_extraction_error(text) and not getattr(text, "ocr_failed", False):
+        cache.put(cache_key, text)
+    return text
+
+def _extract_text_from_bytes_uncached(file_bytes, file_type, progress_callback=None):
+    """Extract text from the bytes of a PDF or DOCX file without touching disk."""
+    try:
+        if file_type.lower() == "pdf":
+            return extract_text_from_pdf_bytes(file_bytes, progress_callback)
+        elif file_type.lower() == "docx":
+            return extract_text_from_docx(io.BytesIO(file_bytes))
+        else:
+            return _error("❌ Unsupported file type. Please upload a PDF or DOCX.")
+    except Exception as e:
+        print(f"❌ Error extracting text: {e}")
+        return _error(f"Error extracting text: {e}")
 
 # Function to download file from S3 and extract text
-def extract_text(file_name, file_type, s3_bucket):
+def extract_text(file_name, file_type, s3_bucket, progress_callback=None):
     """Download file from S3 and extract text from a PDF or DOCX file."""
     
     # Ensure a correct temporary directory
@@ -66,20 +336,16 @@ def extract_text(file_name, file_type, s3_bucket):
         print("✅ Download successful.")
     except Exception as e:
         print(f"❌ Error downloading file from S3: {e}")
-        return f"Error downloading file from S3: {e}"
+        return _error(f"Error downloading file from S3: {e}")
 
     text = ""
 
     try:
-        if file_type.lower() == "pdf":
-            text = extract_text_from_pdf(local_path)
-        elif file_type.lower() == "docx":
-            text = extract_text_from_docx(local_path)
-        else:
-            text = "❌ Unsupported file type. Please upload a PDF or DOCX."
+        with open(local_path, "rb") as f:
+            text = extract_text_from_bytes(f.read(), file_type, progress_callback)
     except Exception as e:
         print(f"❌ Error extracting text: {e}")
-        text = f"Error extracting text: {e}"
+        text = _error(f"Error extracting text: {e}")
     finally:
         # Ensure the file is closed before deleting it
         if os.path.exists(local_path):
@@ -0,0 +1,139 @@
+import os
+import zlib
+import hashlib
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+
+# Cache settings (override through the environment)
+CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(os.getcwd(), "extraction_cache"))
+CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "1024"))
+CACHE_S3_BUCKET = os.getenv("EXTRACTION_CACHE_S3_BUCKET", "")
+CACHE_S3_PREFIX = os.getenv("EXTRACTION_CACHE_S3_PREFIX", "extraction-cache/")
+CACHE_SUFFIX = ".txt.z"
+
+
+class ExtractionCache:
+    """
+    Content-addressed store for extracted document text.
+
+    Entries are keyed by the SHA-256 of the file bytes plus the extractor
+    version, stored zlib-compressed on local disk and evicted least recently
+    used once the directory grows past `max_bytes`. When `s3_bucket` is set,
+    every entry is also mirrored to S3 so other replicas can reuse it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, s3_bucket=CACHE_S3_BUCKET, s3_prefix=CACHE_S3_PREFIX):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self._lock = threading.Lock()
+        self._s3_client = None
+        self._s3_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="extraction-cache-s3") if s3_bucket else None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_bytes, file_type, version):
+        """Cache key for a file's bytes under a given extractor version."""
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        return f"{digest}-{file_type.lower()}-v{version}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def _s3(self):
+        if self._s3_client is None:
+            self._s3_client = boto3.client("s3")
+        return self._s3_client
+
+    def get(self, key):
+        """Return cached text for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for LRU eviction
+            return zlib.decompress(data).decode("utf-8")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Discarding unreadable cache entry {key}: {e}")
+            self._remove(path)
+
+        if not self.s3_bucket:
+            return None
+
+        try:
+            response = self._s3().get_object(Bucket=self.s3_bucket, Key=self.s3_prefix + key + CACHE_SUFFIX)
+            data = response["Body"].read()
+            text = zlib.decompress(data).decode("utf-8")
+        except Exception:
+            return None
+
+        self._write_local(key, data)
+        return text
+
+    def put(self, key, text):
+        """Store extracted text under `key`."""
+        data = zlib.compress(text.encode("utf-8"), 6)
+        self._write_local(key, data)
+
+        if self._s3_executor:
+            self._s3_executor.submit(self._write_s3, key, data)
+
+    def _write_local(self, key, data):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"⚠️ Could not write extraction cache entry {key}: {e}")
+            return
+        self._evict()
+
+    def _write_s3(self, key, data):
+        try:
+            self._s3().put_object(Bucket=self.s3_bucket, Key=self.s3_prefix + key + CACHE_SUFFIX, Body=data)
+        except Exception as e:
+            print(f"⚠️ Could not mirror extraction cache entry {key} to S3: {e}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    """Process-wide extraction cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
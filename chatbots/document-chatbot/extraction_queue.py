@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import tempfile
+from contextlib import contextmanager
+
+# Queue settings (override through the environment)
+QUEUE_DIR = os.getenv("EXTRACTION_QUEUE_DIR", os.path.join(os.getcwd(), "extraction_queue"))
+JOB_TIMEOUT_SECONDS = int(os.getenv("EXTRACTION_JOB_TIMEOUT", "600"))       # Requeue running jobs silent for this long
+JOB_MAX_ATTEMPTS = int(os.getenv("EXTRACTION_JOB_MAX_ATTEMPTS", "3"))
+WORKER_HEARTBEAT_SECONDS = 10
+FINISHED_JOB_TTL_SECONDS = 3600   # Uncollected results are deleted after this long
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, running, done, partial (OCR failed), failed
+    stage TEXT NOT NULL DEFAULT 'queued',    -- queued, extracting, ocr, embedding, done
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_idx ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class ExtractionQueue:
+    """
+    Extraction jobs shared between the Streamlit app and extraction workers.
+
+    Jobs live in a SQLite database in WAL mode and the uploaded bytes in a
+    spool directory next to it, so any process on the host can submit or
+    take work. The app submits and polls; extraction_worker.py processes
+    claim jobs one at a time, report progress and store the extracted text.
+    A job whose worker stops sending heartbeats is handed to another worker.
+    """
+
+    def __init__(self, queue_dir=QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.spool_dir = os.path.join(queue_dir, "spool")
+        self.db_path = os.path.join(queue_dir, "queue.sqlite3")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _db(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _spool_path(self, job_id):
+        return os.path.join(self.spool_dir, job_id)
+
+    # App side
+
+    def submit(self, file_name, file_type, file_bytes):
+        """Queue a file for extraction and return its job id."""
+        job_id = uuid.uuid4().hex
+        fd, tmp_path = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_bytes)
+        os.replace(tmp_path, self._spool_path(job_id))
+
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, file_name, file_type, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, file_name, file_type, time.time())
+            )
+        return job_id
+
+    def status(self, job_id):
+        """Current row for a job (without the result text), or None."""
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT id, file_name, status, stage, pages_done, pages_total, attempts FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def collect(self, job_id):
+        """Return a finished job's text (or error string) and delete the job; None if it is gone."""
+        with self._db() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._remove_spool(job_id)
+        if row is None:
+            return None
+        return row["result"] or ""
+
+    def withdraw(self, job_id):
+        """
+        Take back a job no live worker holds (still queued, or running with a stale heartbeat).
+
+        Returns the file bytes, or None when a worker has the job.
+        """
+        cutoff = time.time() - 3 * WORKER_HEARTBEAT_SECONDS
+        with self._db() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE id = ? AND (status = 'queued' OR (status = 'running' AND heartbeat_at < ?))",
+                (job_id, cutoff)
+            ).rowcount
+        if not deleted:
+            return None
+        try:
+            with open(self._spool_path(job_id), "rb") as f:
+                return f.read()
+        finally:
+            self._remove_spool(job_id)
+
+    def has_live_workers(self):
+        """True when at least one worker has sent a heartbeat recently."""
+        cutoff = time.time() - 3 * WORKER_HEARTBEAT_SECONDS
+        with self._db() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM workers WHERE heartbeat_at > ?", (cutoff,)).fetchone()
+        return row[0] > 0
+
+    # Worker side
+
+    def worker_heartbeat(self, worker_id, job_id=None):
+        """Mark a worker, and the job it is running, as alive."""
+        now = time.time()
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, heartbeat_at) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (worker_id, now)
+            )
+            if job_id:
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ?", (now, job_id, worker_id))
+
+    def worker_exit(self, worker_id):
+        with self._db() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def claim(self, worker_id):
+        """
+        Take the oldest queued job (or a stalled running one) for `worker_id`.
+
+        Returns (job row, file bytes) or None when there is nothing to do.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?)
+                ORDER BY created_at LIMIT 1
+                """,
+                (now - JOB_TIMEOUT_SECONDS,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            if row["attempts"] >= JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', stage = 'done', result = ?, finished_at = ? WHERE id = ?",
+                    (f"Error extracting text: gave up after {row['attempts']} attempts", now, row["id"])
+                )
+                conn.execute("COMMIT")
+                self._remove_spool(row["id"])
+                return self.claim(worker_id)
+
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', stage = 'extracting', worker = ?, attempts = attempts + 1,
+                                pages_done = 0, pages_total = 0, heartbeat_at = ?
+                WHERE id = ?
+                """,
+                (worker_id, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        with open(self._spool_path(row["id"]), "rb") as f:
+            return dict(row), f.read()
+
+    def update(self, job_id, stage, pages_done=0, pages_total=0):
+        """Record a running job's stage and page progress (doubles as its heartbeat)."""
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, pages_done = ?, pages_total = ?, heartbeat_at = ? WHERE id = ?",
+                (stage, pages_done, pages_total, time.time(), job_id)
+            )
+
+    def finish(self, job_id, result, failed=False, ocr_failed=False):
+        """Store a job's extracted text (or error string) for the app to collect; `ocr_failed` marks partial text."""
+        status = "failed" if failed else "partial" if ocr_failed else "done"
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (status, result, time.time(), job_id)
+            )
+        self._remove_spool(job_id)
+
+    def prune(self):
+        """Delete results nobody collected and workers that stopped reporting."""
+        now = time.time()
+        with self._db() as conn:
+            stale = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'partial', 'failed') AND finished_at < ?",
+                (now - FINISHED_JOB_TTL_SECONDS,)
+            )]
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in stale])
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - FINISHED_JOB_TTL_SECONDS,))
+        for job_id in stale:
+            self._remove_spool(job_id)
+
+    def _remove_spool(self, job_id):
+        try:
+            os.remove(self._spool_path(job_id))
+        except OSError:
+            pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_extraction_queue():
+    """Process-wide handle on the extraction queue, created on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ExtractionQueue()
+        return _queue
@@ -0,0 +1,143 @@
+"""
+Extraction worker pool for the document chatbot.
+
+Run next to the Streamlit app, sized independently of the web replicas:
+
+    python extraction_worker.py --workers 4
+
+(docker-compose.yml runs it as the extraction-worker service). The queue is
+SQLite in WAL mode, so the app and the workers must share a local directory on
+one host; WAL does not work over NFS or other network filesystems.
+
+Each worker process claims jobs from the extraction queue, extracts and
+embeds the document, and stores the text for the app to collect.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+import multiprocessing
+
+# Shared modules live in ../common locally and in /app/common inside the container
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction_queue import get_extraction_queue, WORKER_HEARTBEAT_SECONDS
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+POLL_INTERVAL = 1.0           # Seconds an idle worker waits before checking the queue again
+PROGRESS_INTERVAL = 0.5       # Seconds between OCR progress writes
+PRUNE_INTERVAL = 300          # Seconds between clean-ups of uncollected results
+
+
+def process_job(queue, job, file_bytes):
+    """Extract and embed one claimed job, then store its text."""
+    # Imported here so the supervisor process stays light
+    from extract_text import extract_text_from_bytes, is_extraction_error
+    from vector_index import get_vector_store
+
+    job_id = job["id"]
+    last_write = [0.0]
+
+    def report_ocr_progress(done, total):
+        now = time.monotonic()
+        if done == total or now - last_write[0] >= PROGRESS_INTERVAL:
+            queue.update(job_id, "ocr", done, total)
+            last_write[0] = now
+
+    text = extract_text_from_bytes(file_bytes, job["file_type"], progress_callback=report_ocr_progress)
+    failed = is_extraction_error(text)
+    if not failed:
+        queue.update(job_id, "embedding")
+        try:
+            get_vector_store().ensure(text)
+        except Exception as e:
+            print(f"⚠️ Could not embed {job['file_name']}, semantic search will retry on demand: {e}")
+    queue.finish(job_id, text, failed=failed, ocr_failed=getattr(text, "ocr_failed", False))
+
+
+def worker_main(stop_event):
+    """Claim and process jobs until `stop_event` is set."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The supervisor handles Ctrl+C and stops us through the event
+    queue = get_extraction_queue()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    current_job = [None]
+
+    def heartbeat():
+        while not stop_event.wait(WORKER_HEARTBEAT_SECONDS):
+            try:
+                queue.worker_heartbeat(worker_id, current_job[0])
+            except Exception as e:
+                print(f"⚠️ Worker {worker_id} heartbeat failed: {e}")
+
+    queue.worker_heartbeat(worker_id)
+    threading.Thread(target=heartbeat, daemon=True).start()
+    print(f"👷 Extraction worker {worker_id} started")
+
+    try:
+        while not stop_event.is_set():
+            try:
+                claimed = queue.claim(worker_id)
+            except Exception as e:
+                print(f"⚠️ Worker {worker_id} could not read the queue: {e}")
+                claimed = None
+            if claimed is None:
+                stop_event.wait(POLL_INTERVAL)
+                continue
+
+            job, file_bytes = claimed
+            current_job[0] = job["id"]
+            print(f"📄 Worker {worker_id} extracting {job['file_name']}")
+            try:
+                process_job(queue, job, file_bytes)
+            except Exception as e:
+                print(f"❌ Error extracting {job['file_name']}: {e}")
+                queue.finish(job["id"], f"Error extracting text: {e}", failed=True)
+            finally:
+                current_job[0] = None
+    finally:
+        queue.worker_exit(worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run document extraction workers.")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS, help="number of worker processes")
+    args = parser.parse_args()
+
+    # Spawn instead of fork, matching the OCR pool each worker starts
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    processes = []
+
+    def shutdown(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    queue = get_extraction_queue()
+    last_prune = 0.0
+    print(f"🚀 Starting {args.workers} extraction workers on {queue.queue_dir}")
+    while not stop_event.is_set():
+        # Start missing workers and replace any that died
+        processes = [process for process in processes if process.is_alive()]
+        while len(processes) < args.workers:
+            process = context.Process(target=worker_main, args=(stop_event,))
+            process.start()
+            processes.append(process)
+
+        if time.monotonic() - last_prune >= PRUNE_INTERVAL:
+            queue.prune()
+            last_prune = time.monotonic()
+        stop_event.wait(POLL_INTERVAL)
+
+    for process in processes:
+        process.join(timeout=30)
+        if process.is_alive():
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
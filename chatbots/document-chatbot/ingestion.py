@@ -0,0 +1,193 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from extract_text import extract_text_from_bytes, is_extraction_error, ExtractionResult
+from extraction_queue import get_extraction_queue
+from vector_index import get_vector_store
+
+# Number of files extracted at the same time (shared by every session in the process)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+
+# Seconds between progress checks while the app waits on extraction
+INGESTION_POLL_SECONDS = 0.5
+
+# A queued job with no live worker after this many seconds is extracted in-process instead...
+QUEUE_FALLBACK_SECONDS = int(os.getenv("EXTRACTION_QUEUE_FALLBACK", "30"))
+# ...and the app stops waiting on a queued job after this many (longer than the queue's requeue timeout)
+QUEUE_WAIT_TIMEOUT_SECONDS = int(os.getenv("EXTRACTION_WAIT_TIMEOUT", "900"))
+
+# Where extraction runs: "queue" (extraction_worker.py processes), "thread" (in this process)
+# or "auto" (the queue whenever a worker is alive). docker-compose.yml sets "queue" and runs the workers.
+INGESTION_BACKEND = os.getenv("INGESTION_BACKEND", "auto")
+
+_ingestion_pool = None
+_ingestion_pool_lock = threading.Lock()
+
+def get_ingestion_pool():
+    """Return the thread pool that runs file extraction, creating it on first use."""
+    global _ingestion_pool
+    with _ingestion_pool_lock:
+        if _ingestion_pool is None:
+            _ingestion_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+        return _ingestion_pool
+
+
+class IngestionJob:
+    """One uploaded file moving through extraction on the ingestion pool."""
+
+    def __init__(self, file_name, file_type):
+        self.file_name = file_name
+        self.file_type = file_type
+        self.stage = "queued"
+        self.pages_done = 0
+        self.pages_total = 0
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def _report_ocr_progress(self, done, total):
+        self.stage = "ocr"
+        self.pages_done = done
+        self.pages_total = total
+
+    def _run(self, file_bytes):
+        self.started_at = time.time()
+        self.stage = "extracting"
+        try:
+            text = extract_text_from_bytes(file_bytes, self.file_type, progress_callback=self._report_ocr_progress)
+            if not is_extraction_error(text):
+                self._embed(text)
+            return text
+        finally:
+            self.stage = "done"
+            self.finished_at = time.time()
+
+    def _embed(self, text):
+        """Embed and persist the document's chunks so the session index only has to load them."""
+        self.stage = "embedding"
+        try:
+            get_vector_store().ensure(text)
+        except Exception as e:
+            print(f"⚠️ Could not embed {self.file_name}, semantic search will retry on demand: {e}")
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """Extracted text (an ExtractionResult), or an error result if extraction raised."""
+        try:
+            return self.future.result()
+        except Exception as e:
+            print(f"❌ Error extracting {self.file_name}: {e}")
+            return ExtractionResult(f"Error extracting text: {e}", error=True)
+
+    def progress(self):
+        """Completion fraction for progress bars (OCR pages when known)."""
+        if self.stage == "done":
+            return 1.0
+        if self.pages_total:
+            return self.pages_done / self.pages_total
+        return 0.0
+
+    def status_text(self):
+        if self.stage == "queued":
+            return f"⏳ {self.file_name}: waiting for a worker..."
+        if self.stage == "ocr":
+            return f"🔍 {self.file_name}: OCR page {self.pages_done} of {self.pages_total}"
+        if self.stage == "extracting":
+            return f"📄 {self.file_name}: extracting text..."
+        if self.stage == "embedding":
+            return f"🧠 {self.file_name}: indexing for semantic search..."
+        return f"✅ {self.file_name}: done"
+
+
+class QueuedIngestionJob(IngestionJob):
+    """An uploaded file extracted by the out-of-process worker pool, polled through the queue."""
+
+    def __init__(self, file_name, file_type, job_id):
+        super().__init__(file_name, file_type)
+        self.job_id = job_id
+        self.started_at = time.time()
+        self._text = None
+        self._local = None    # In-process job, once the queue was given up on
+
+    def _finish(self, text):
+        self._text = text
+        self.stage = "done"
+        self.finished_at = time.time()
+
+    def _poll(self):
+        if self._text is not None:
+            return
+        if self._local is not None:
+            self.stage, self.pages_done, self.pages_total = self._local.stage, self._local.pages_done, self._local.pages_total
+            if self._local.done():
+                self._finish(self._local.result())
+            return
+
+        queue = get_extraction_queue()
+        status = queue.status(self.job_id)
+        if status is None:
+            self._text = ExtractionResult("Error extracting text: job was lost", error=True)
+            self.stage = "done"
+            return
+        self.stage = status["stage"]
+        self.pages_done = status["pages_done"]
+        self.pages_total = status["pages_total"]
+        if status["status"] in ("done", "partial", "failed"):
+            text = queue.collect(self.job_id)
+            if text is None:
+                self._finish(ExtractionResult("Error extracting text: job was lost", error=True))
+            else:
+                self._finish(ExtractionResult(text, error=status["status"] == "failed", ocr_failed=status["status"] == "partial"))
+            return
+
+        # No worker left to run it: take the job back and extract it here
+        waited = time.time() - self.started_at
+        if waited >= QUEUE_FALLBACK_SECONDS and not queue.has_live_workers():
+            file_bytes = queue.withdraw(self.job_id)
+            if file_bytes is not None:
+                print(f"⚠️ No extraction worker is running, extracting {self.file_name} in-process")
+                self._local = IngestionJob(self.file_name, self.file_type)
+                self._local.future = get_ingestion_pool().submit(self._local._run, file_bytes)
+                return
+        if waited >= QUEUE_WAIT_TIMEOUT_SECONDS:
+            print(f"❌ Gave up waiting for {self.file_name} after {QUEUE_WAIT_TIMEOUT_SECONDS}s")
+            self._finish(ExtractionResult(f"Error extracting text: no result after {QUEUE_WAIT_TIMEOUT_SECONDS} seconds", error=True))
+
+    def done(self):
+        self._poll()
+        return self._text is not None
+
+    def result(self):
+        self._poll()
+        return self._text
+
+    def progress(self):
+        self._poll()
+        return super().progress()
+
+
+def use_extraction_queue():
+    """True when uploads should go to the worker queue instead of the local pool."""
+    if INGESTION_BACKEND == "queue":
+        return True
+    if INGESTION_BACKEND == "thread":
+        return False
+    try:
+        return get_extraction_queue().has_live_workers()
+    except Exception as e:
+        print(f"⚠️ Extraction queue unavailable, extracting in-process: {e}")
+        return False
+
+
+def submit_ingestion(file_name, file_type, file_bytes):
+    """Queue a file for extraction and return its IngestionJob."""
+    if use_extraction_queue():
+        job_id = get_extraction_queue().submit(file_name, file_type, file_bytes)
+        return QueuedIngestionJob(file_name, file_type, job_id)
+
+    job = IngestionJob(file_name, file_type)
+    job.future = get_ingestion_pool().submit(job._run, file_bytes)
+    return job
@@ -0,0 +1,122 @@
+import os
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+from pdf2image import convert_from_path, convert_from_bytes
+
+# tesserocr keeps one tesseract engine loaded per worker; without it we fall back to pytesseract
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Render settings for the in-process backend (override through the environment)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "300"))
+OCR_MAX_PAGE_PIXELS = int(os.getenv("OCR_MAX_PAGE_PIXELS", "4000"))  # Longest side of a rendered page
+
+# Tesseract engine owned by the current worker process
+_tess_api = None
+
+
+class OCRBackend:
+    """Renders PDF pages to picklable payloads and turns a payload into text."""
+
+    name = "base"
+    bytes_per_pixel = 3
+
+    def page_dpi(self, page):
+        return OCR_DPI
+
+    def estimate_page_bytes(self, page):
+        """Rough memory needed to hold one rendered page."""
+        scale = self.page_dpi(page) / 72
+        return page.rect.width * scale * page.rect.height * scale * self.bytes_per_pixel
+
+    def render(self, doc, source, first, last):
+        """Render pages [first, last) of `doc`; `source` is the PDF path or bytes."""
+        raise NotImplementedError
+
+    def recognize(self, payload):
+        """OCR one rendered page. Runs inside a pool worker."""
+        raise NotImplementedError
+
+
+class PopplerTesseractBackend(OCRBackend):
+    """Original path: poppler's pdftoppm for rendering, one tesseract process per page."""
+
+    name = "poppler"
+
+    def render(self, doc, source, first, last):
+        if isinstance(source, (bytes, bytearray)):
+            return convert_from_bytes(source, dpi=OCR_DPI, first_page=first + 1, last_page=last)
+        return convert_from_path(source, dpi=OCR_DPI, first_page=first + 1, last_page=last)
+
+    def recognize(self, payload):
+        return pytesseract.image_to_string(payload, lang=OCR_LANG)
+
+
+class PyMuPDFTesseractBackend(OCRBackend):
+    """In-process grayscale pixmaps at an adaptive DPI, fed to a long-lived tesseract engine."""
+
+    name = "pymupdf"
+    bytes_per_pixel = 1
+
+    def page_dpi(self, page):
+        """Match the scan's native resolution, clamped to a sane range and pixel budget."""
+        dpi = OCR_DPI
+        images = page.get_image_info()
+        if images:
+            largest = max(images, key=lambda info: fitz.Rect(info["bbox"]).get_area())
+            bbox_width = fitz.Rect(largest["bbox"]).width
+            if bbox_width > 0 and largest.get("width"):
+                dpi = largest["width"] / (bbox_width / 72)
+        dpi = min(max(dpi, OCR_MIN_DPI), OCR_MAX_DPI)
+
+        longest_side_inches = max(page.rect.width, page.rect.height) / 72
+        if longest_side_inches > 0:
+            dpi = min(dpi, OCR_MAX_PAGE_PIXELS / longest_side_inches)
+        return int(dpi)
+
+    def render(self, doc, source, first, last):
+        payloads = []
+        for page_no in range(first, last):
+            page = doc[page_no]
+            pix = page.get_pixmap(dpi=self.page_dpi(page), colorspace=fitz.csGRAY, alpha=False)
+            payloads.append((pix.width, pix.height, pix.stride, pix.samples))
+        return payloads
+
+    def recognize(self, payload):
+        width, height, stride, samples = payload
+        if tesserocr is None:
+            image = Image.frombytes("L", (width, height), samples, "raw", "L", stride)
+            return pytesseract.image_to_string(image, lang=OCR_LANG)
+
+        global _tess_api
+        if _tess_api is None:
+            _tess_api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+        _tess_api.SetImageBytes(samples, width, height, 1, stride)
+        return _tess_api.GetUTF8Text()
+
+
+OCR_BACKENDS = {
+    PyMuPDFTesseractBackend.name: PyMuPDFTesseractBackend(),
+    PopplerTesseractBackend.name: PopplerTesseractBackend(),
+}
+DEFAULT_OCR_BACKEND = os.getenv("OCR_BACKEND", PyMuPDFTesseractBackend.name)
+FALLBACK_OCR_BACKEND = PopplerTesseractBackend.name
+
+
+def get_ocr_backend(name=None):
+    """Look up an OCR backend by name, defaulting to OCR_BACKEND."""
+    name = name or DEFAULT_OCR_BACKEND
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}")
+    return OCR_BACKENDS[name]
+
+
+def recognize_page(backend_name, payload):
+    """Pool entry point: OCR one rendered page with the named backend."""
+    return OCR_BACKENDS[backend_name].recognize(payload)
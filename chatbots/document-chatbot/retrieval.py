@@ -0,0 +1,177 @@
+import os
+import re
+import math
+import heapq
+from collections import Counter, defaultdict
+
+# Chunking and retrieval settings (override through the environment)
+CHUNK_SIZE = int(os.getenv("RETRIEVAL_CHUNK_SIZE", "1500"))        # characters per chunk
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "200"))   # characters shared by neighbouring chunks
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its "
+    "me my not of on or our so that the their them there these they this to was we "
+    "what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercased word tokens with common stopwords removed."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _last_break(text, start, end):
+    """Index of the last whitespace in text[start:end], or -1."""
+    return max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping chunks of roughly `chunk_size` characters, breaking on whitespace."""
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, overlap)]
+
+
+def chunk_spans(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """(start, end) offsets of the chunks chunk_text returns, so indexes can slice them back out of the text."""
+    spans = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            split = _last_break(text, start + chunk_size // 2, end)
+            if split > start:
+                end = split
+
+        # Same bounds as text[start:end].strip()
+        chunk_start, chunk_end = start, end
+        while chunk_start < chunk_end and text[chunk_start].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_end > chunk_start:
+            spans.append((chunk_start, chunk_end))
+        if end >= length:
+            break
+
+        # Start the next chunk `overlap` characters back, on a word boundary
+        next_start = end - overlap
+        split = _last_break(text, next_start, end)
+        if split > next_start:
+            next_start = split + 1
+        start = max(next_start, start + 1)
+    return spans
+
+
+class RetrievedChunk:
+    """A chunk returned by a search, with its source document and score."""
+
+    def __init__(self, doc_name, text, score, position):
+        self.doc_name = doc_name
+        self.text = text
+        self.score = score
+        self.position = position  # Chunk number inside its document
+
+
+def resolve_chunks(documents, hits):
+    """RetrievedChunks for (doc_name, position, start, end, score) hits, reading each document's text once."""
+    texts = {}
+    results = []
+    for doc_name, position, start, end, score in hits:
+        if doc_name not in texts:
+            texts[doc_name] = documents.get(doc_name)
+        if texts[doc_name] is not None:
+            results.append(RetrievedChunk(doc_name, texts[doc_name][start:end], score, position))
+    return results
+
+
+class BM25Index:
+    """
+    In-memory inverted index over document chunks, ranked with Okapi BM25.
+
+    Chunks are kept as offsets; their text is sliced out of `documents`
+    (anything with `get(name)`, such as the session's SessionDocumentStore)
+    only for the results of a search. Without `documents` the index keeps
+    the text itself.
+    """
+
+    def __init__(self, documents=None, k1=1.5, b=0.75, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        self.documents = documents if documents is not None else {}
+        self._owns_text = documents is None
+        self.k1 = k1
+        self.b = b
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.chunks = []                  # (doc_name, position, start, end)
+        self.chunk_lengths = []
+        self.postings = defaultdict(dict)  # term -> {chunk_id: term frequency}
+        self.total_length = 0
+        self.doc_names = set()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add_document(self, doc_name, text):
+        """Chunk and index a document. Re-adding an indexed document is a no-op."""
+        if doc_name in self.doc_names:
+            return
+        self.doc_names.add(doc_name)
+        if self._owns_text:
+            self.documents[doc_name] = text
+
+        for position, (start, end) in enumerate(chunk_spans(text, self.chunk_size, self.overlap)):
+            chunk_id = len(self.chunks)
+            terms = Counter(tokenize(text[start:end]))
+            self.chunks.append((doc_name, position, start, end))
+            self.chunk_lengths.append(sum(terms.values()))
+            self.total_length += self.chunk_lengths[-1]
+            for term, freq in terms.items():
+                self.postings[term][chunk_id] = freq
+
+    def sync(self, documents):
+        """Index any (name, text) documents not yet in the index."""
+        for doc_name, text in documents:
+            self.add_document(doc_name, text)
+
+    def search(self, query, top_k=RETRIEVAL_TOP_K):
+        """Return the `top_k` best chunks for `query`, best first."""
+        if not self.chunks:
+            return []
+
+        total_chunks = len(self.chunks)
+        avg_length = self.total_length / total_chunks or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, freq in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        if not scores:
+            return self._leading_chunks(top_k)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return resolve_chunks(self.documents, [self.chunks[chunk_id] + (score,) for chunk_id, score in best])
+
+    def _leading_chunks(self, top_k):
+        """Fallback for queries with no matching terms: the opening chunks of every document."""
+        ranked = sorted(range(len(self.chunks)), key=lambda chunk_id: self.chunks[chunk_id][1])
+        return resolve_chunks(self.documents, [self.chunks[chunk_id] + (0.0,) for chunk_id in ranked[:top_k]])
+
+
+def fuse_results(result_lists, top_k=RETRIEVAL_TOP_K, k=60):
+    """Merge several ranked result lists with reciprocal rank fusion."""
+    scores = defaultdict(float)
+    chunks = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            key = (result.doc_name, result.position)
+            scores[key] += 1.0 / (k + rank + 1)
+            chunks.setdefault(key, result)
+
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [RetrievedChunk(chunks[key].doc_name, chunks[key].text, score, chunks[key].position) for key, score in best]
@@ -0,0 +1,48 @@
+import os
+import streamlit as st
+
+# Messages shown before the "load earlier" control (override through the environment)
+TRANSCRIPT_WINDOW = int(os.getenv("TRANSCRIPT_WINDOW", "20"))
+
+ICONS = {"You": "🧑‍💻", "AI": "🤖 AI:"}
+
+
+def bubble_html(speaker, text):
+    """HTML for one chat bubble."""
+    alignment = "user" if speaker == "You" else "ai"
+    icon = ICONS.get(speaker, ICONS["AI"])
+    return f"<div class='chat-bubble {alignment}'><strong>{icon}</strong> {text}</div>"
+
+
+class Transcript:
+    """
+    Incremental renderer for a session's chat history.
+
+    Bubble HTML is built once per message and cached, so each rerun only
+    formats messages added since the last one. Only the most recent
+    `window` messages are drawn; a "load earlier" button reveals older ones
+    a window at a time. Rerun cost therefore stays flat however long the
+    conversation gets.
+    """
+
+    def __init__(self, window=TRANSCRIPT_WINDOW):
+        self.window = window
+        self.visible = window
+        self._html = []
+
+    def sync(self, history):
+        """Render HTML for messages appended since the last call."""
+        if len(history) < len(self._html):
+            # History was cleared or replaced: start over
+            self._html = []
+            self.visible = self.window
+        for speaker, text in history[len(self._html):]:
+            self._html.append(bubble_html(speaker, text))
+
+    def render(self, history):
+        self.sync(history)
+        hidden = len(self._html) - self.visible
+        if hidden > 0 and st.button(f"⬆️ Load earlier messages ({hidden} more)", key="transcript_load_earlier"):
+            self.visible += self.window
+        for html in self._html[-self.visible:]:
+            st.markdown(html, unsafe_allow_html=True)
@@ -0,0 +1,250 @@
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from common.bedrock_gateway import get_bedrock_gateway
+from retrieval import chunk_text, chunk_spans, resolve_chunks, tokenize, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVAL_TOP_K
+
+# Embedding and index settings (override through the environment)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "bedrock")     # "bedrock" or "hashing"
+TITAN_EMBED_MODEL_ID = os.getenv("TITAN_EMBED_MODEL_ID", "amazon.titan-embed-text-v2:0")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(os.getcwd(), "vector_store"))
+IVF_MIN_VECTORS = int(os.getenv("IVF_MIN_VECTORS", "5000"))       # Switch from brute force to IVF above this size
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+
+def _normalize(matrix):
+    """L2-normalize rows so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class Embedder:
+    """Turns a list of texts into an (n, dim) float32 matrix of unit vectors."""
+
+    name = "base"
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    @property
+    def cache_id(self):
+        """Identifies vectors produced by this embedder in the persistent store."""
+        return f"{self.name}-{self.dim}"
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic signed feature-hashing embedder for tests and offline benchmarks."""
+
+    name = "hashing"
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                matrix[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        return _normalize(matrix)
+
+
+class BedrockTitanEmbedder(Embedder):
+    """Amazon Titan text embeddings through Bedrock, one request per text, fanned out over threads."""
+
+    name = "bedrock"
+
+    def __init__(self, dim=EMBEDDING_DIM, model_id=TITAN_EMBED_MODEL_ID, concurrency=EMBED_CONCURRENCY):
+        super().__init__(dim)
+        self.model_id = model_id
+        self.concurrency = concurrency
+
+    @property
+    def cache_id(self):
+        return f"{self.name}-{self.model_id.replace(':', '_')}-{self.dim}"
+
+    def _embed_one(self, text):
+        body = {"inputText": text, "dimensions": self.dim, "normalize": True}
+        return get_bedrock_gateway().invoke(self.model_id, body)["embedding"]
+
+    def embed(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            vectors = list(pool.map(self._embed_one, texts))
+        return _normalize(np.array(vectors, dtype=np.float32))
+
+
+EMBEDDERS = {
+    BedrockTitanEmbedder.name: BedrockTitanEmbedder,
+    HashingEmbedder.name: HashingEmbedder,
+}
+
+
+class VectorStore:
+    """Chunk embeddings persisted on disk per document content hash and embedder."""
+
+    def __init__(self, embedder, store_dir=VECTOR_STORE_DIR, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        self.embedder = embedder
+        self.store_dir = store_dir
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        os.makedirs(store_dir, exist_ok=True)
+
+    def key(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{digest}-c{self.chunk_size}o{self.overlap}-{self.embedder.cache_id}"
+
+    def _path(self, key):
+        return os.path.join(self.store_dir, key + ".npz")
+
+    def load(self, key):
+        """Return (chunks, vectors) for a stored document, or None."""
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data:
+                return [str(chunk) for chunk in data["chunks"]], data["vectors"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable vector store entry {key}: {e}")
+            return None
+
+    def ensure(self, text):
+        """Return (chunks, vectors) for a document, embedding and saving it on first sight."""
+        key = self.key(text)
+        stored = self.load(key)
+        if stored is not None:
+            return stored
+
+        chunks = chunk_text(text, self.chunk_size, self.overlap)
+        vectors = self.embedder.embed(chunks)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, chunks=np.array(chunks, dtype=str), vectors=vectors)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"⚠️ Could not persist vectors for {key}: {e}")
+        return chunks, vectors
+
+
+class VectorIndex:
+    """
+    NumPy matrix of chunk embeddings searched by cosine similarity.
+
+    Small corpora are searched brute force. Once the index holds
+    `ivf_min_vectors` chunks it is partitioned with spherical k-means and a
+    query only scans the `nprobe` closest partitions. Like BM25Index, chunks
+    are kept as offsets into `documents` (the index keeps the text itself
+    when none is given).
+    """
+
+    def __init__(self, store, documents=None, ivf_min_vectors=IVF_MIN_VECTORS, nprobe=IVF_NPROBE):
+        self.store = store
+        self.documents = documents if documents is not None else {}
+        self._owns_text = documents is None
+        self.embedder = store.embedder
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.chunks = []  # (doc_name, position, start, end)
+        self.doc_names = set()
+        self._centroids = None
+        self._partitions = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add_document(self, doc_name, text):
+        """Add a document's chunk vectors, reusing stored vectors when available."""
+        if doc_name in self.doc_names:
+            return
+        chunks, vectors = self.store.ensure(text)
+        spans = chunk_spans(text, self.store.chunk_size, self.store.overlap)
+        if len(spans) != len(chunks):
+            raise ValueError(f"Stored chunks for {doc_name} do not match its text")
+        self.doc_names.add(doc_name)
+        if self._owns_text:
+            self.documents[doc_name] = text
+        self.chunks.extend((doc_name, position, start, end) for position, (start, end) in enumerate(spans))
+        self.vectors = np.vstack([self.vectors, vectors])
+        self._centroids = None  # Partitions are rebuilt lazily on the next IVF search
+
+    def sync(self, documents):
+        """Index any (name, text) documents not yet in the index."""
+        for doc_name, text in documents:
+            self.add_document(doc_name, text)
+
+    def search(self, query, top_k=RETRIEVAL_TOP_K):
+        """Return the `top_k` chunks most similar to `query`, best first."""
+        if not self.chunks:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        if len(self.chunks) >= self.ivf_min_vectors:
+            candidates = self._ivf_candidates(query_vector)
+        else:
+            candidates = np.arange(len(self.chunks))
+
+        if len(candidates) == 0:
+            return []
+
+        scores = self.vectors[candidates] @ query_vector
+        top_k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        return resolve_chunks(self.documents, [self.chunks[candidates[i]] + (float(scores[i]),) for i in best])
+
+    def _build_partitions(self, iterations=10, batch_size=10000):
+        """Spherical k-means over the stored vectors with roughly sqrt(n) partitions."""
+        count = len(self.vectors)
+        partitions = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        centroids = self.vectors[rng.choice(count, size=partitions, replace=False)]
+
+        assignment = np.zeros(count, dtype=np.int64)
+        for _ in range(iterations):
+            for start in range(0, count, batch_size):
+                block = self.vectors[start:start + batch_size]
+                assignment[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            sums[empty] = centroids[empty]  # Keep empty partitions where they were
+            centroids = _normalize(sums)
+
+        self._centroids = centroids
+        self._partitions = [np.flatnonzero(assignment == p) for p in range(partitions)]
+
+    def _ivf_candidates(self, query_vector):
+        if self._centroids is None:
+            self._build_partitions()
+        nprobe = min(self.nprobe, len(self._centroids))
+        closest = np.argpartition(-(self._centroids @ query_vector), nprobe - 1)[:nprobe]
+        return np.concatenate([self._partitions[p] for p in closest])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_embedder(name=None):
+    """Create the embedder selected by EMBEDDING_BACKEND (or `name`)."""
+    name = name or EMBEDDING_BACKEND
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    return EMBEDDERS[name]()
+
+def get_vector_store():
+    """Process-wide vector store for the configured embedder, created on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = VectorStore(get_embedder())
+        return _store